@@ -0,0 +1,110 @@
+"""下载流程基准测试：在本地替身歌词平台上测量单曲搜索和批量爬取的吞吐量与尾延迟
+
+单曲搜索调用 search_lyrics.search_song_lyrics_async（不指定音乐源时同时搜索三个平台，以及分别只搜索
+一个平台）；批量爬取对每个平台调用 fetch_lyrics 的歌曲列表函数和 download_song。不使用响应缓存，
+歌词写入临时目录。
+
+用法: python benchmarks/bench_fetch_pipeline.py [--songs 200] [--concurrency 8] [--latency 0.02] [--error-rate 0.02]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_utils import import_tool_module, percentile
+from stand_in_providers import StandInProviders, run_in_thread
+
+SEARCH_SOURCES = (None, "netease", "qq", "kugou")
+CRAWL_SOURCES = {"1": "netease", "2": "qq", "3": "kugou"}
+
+
+def report(label, latencies, ok_count, elapsed):
+    print(f"{label}: {len(latencies) / elapsed:.1f} 首/s，成功 {ok_count}/{len(latencies)}，"
+          f"p50 {percentile(latencies, 0.5) * 1000:.0f} ms，p95 {percentile(latencies, 0.95) * 1000:.0f} ms，"
+          f"p99 {percentile(latencies, 0.99) * 1000:.0f} ms")
+
+
+async def bench_search(search_lyrics, provider_client, base_url, songs, source, concurrency):
+    """并发搜索 songs 中的每首歌，返回 (每首耗时列表, 成功数, 总耗时)"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def search_one(song, client):
+        async with semaphore:
+            start = time.perf_counter()
+            lyrics = await search_lyrics.search_song_lyrics_async(song["name"], source, song["artist"], client)
+            latencies.append(time.perf_counter() - start)
+            return bool(lyrics)
+
+    # 替身平台的所有接口在同一个主机上，按平台数放大每个主机的连接数，与分别连接三个平台时相当
+    pool_size = provider_client.POOL_SIZE_PER_HOST * len(search_lyrics.PLATFORMS)
+    async with provider_client.AsyncProviderClient(base_url=base_url, pool_size=pool_size) as client:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(search_one(song, client) for song in songs))
+        elapsed = time.perf_counter() - start
+    return latencies, sum(results), elapsed
+
+
+def bench_crawl(fetch_lyrics, artist, source, concurrency):
+    """获取歌手的歌曲列表并并发下载歌词，返回 (每首耗时列表, 成功数, 总耗时)"""
+    list_songs = {"1": fetch_lyrics.get_artist_songs, "2": fetch_lyrics.get_qq_music_songs,
+                  "3": fetch_lyrics.get_kugou_songs}[source]
+
+    def download(song):
+        start = time.perf_counter()
+        status = fetch_lyrics.download_song(song, source)[0]
+        return time.perf_counter() - start, status in fetch_lyrics.DONE_STATUSES
+
+    start = time.perf_counter()
+    songs = list_songs(artist)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(download, songs))
+    elapsed = time.perf_counter() - start
+    return [latency for latency, _ in results], sum(ok for _, ok in results), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="下载流程基准测试")
+    parser.add_argument("--songs", type=int, default=200, help="单曲搜索的歌曲数")
+    parser.add_argument("--concurrency", type=int, default=8, help="同时搜索或下载的歌曲数")
+    parser.add_argument("--latency", type=float, default=0.02, help="替身平台每个请求的平均延迟（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="替身平台返回 503 的概率")
+    args = parser.parse_args()
+
+    provider_client = import_tool_module("provider_client")
+    search_lyrics = import_tool_module("search_lyrics")
+    fetch_lyrics = import_tool_module("fetch_lyrics")
+
+    providers = StandInProviders(song_count=max(args.songs, 1000), latency=args.latency,
+                                 error_rate=args.error_rate)
+    base_url, stop = run_in_thread(providers)
+    print(f"替身歌词平台: {base_url}，平均延迟 {args.latency * 1000:.0f} ms，错误率 {args.error_rate:.0%}，"
+          f"并发 {args.concurrency}")
+    songs = providers.songs[:args.songs]
+    try:
+        for source in SEARCH_SOURCES:
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = asyncio.run(bench_search(search_lyrics, provider_client, base_url, songs, source,
+                                                  args.concurrency))
+            report(f"单曲搜索（{source or '全部平台'}）", *result)
+
+        artist = providers.artists[0]
+        with tempfile.TemporaryDirectory() as lyrics_dir:
+            fetch_lyrics.LYRICS_DIR = lyrics_dir
+            fetch_lyrics.CLIENT.close()
+            fetch_lyrics.CLIENT = provider_client.SyncProviderClient(base_url=base_url)
+            for source, name in CRAWL_SOURCES.items():
+                with contextlib.redirect_stdout(io.StringIO()):
+                    result = bench_crawl(fetch_lyrics, artist, source, args.concurrency)
+                report(f"批量爬取（{name}，{artist}）", *result)
+            fetch_lyrics.CLIENT.close()
+        print(f"替身平台请求数: {providers.requests}，返回 503: {providers.errors}")
+    finally:
+        stop()
+
+
+if __name__ == "__main__":
+    main()
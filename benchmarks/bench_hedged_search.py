@@ -0,0 +1,81 @@
+"""对冲搜索基准测试：在偶尔卡住的本地替身歌词平台上比较不同搜索方式的 p50/p95/p99 延迟
+
+对每种搜索方式（sequential 逐个平台、hedge 对冲、race 同时搜索所有平台）用新的 ProviderStats
+调用 search_and_save_lyrics_async（/lyrics search 的搜索与保存部分），歌词保存到临时目录，
+同时报告每次搜索平均发出的请求数。计时前先用另外 --warmup 首歌预热 ProviderStats，
+使对冲等待时间所依据的耗时分位数有足够的记录（与插件运行一段时间后的状态一致），预热不计入结果。
+
+用法: python benchmarks/bench_hedged_search.py [--songs 200] [--warmup 50] [--concurrency 4] [--stall-rate 0.05] [--percentile 0.9]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import tempfile
+import time
+
+from bench_utils import import_tool_module, percentile
+from stand_in_providers import StandInProviders, run_in_thread
+
+
+async def bench_mode(search_lyrics, provider_client, provider_stats, providers, base_url, warmup_songs, songs,
+                     mode, args, lyrics_dir):
+    """用 mode 先搜索 warmup_songs 预热统计，再搜索 songs 中的每首歌，返回 (每首耗时列表, 成功数, 请求数)"""
+    stats = provider_stats.ProviderStats()
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def search_one(song, client, latencies):
+        async with semaphore:
+            start = time.perf_counter()
+            success, _, _ = await search_lyrics.search_and_save_lyrics_async(
+                song["name"], song["artist"], None, lyrics_dir, client, stats, mode, args.percentile)
+            latencies.append(time.perf_counter() - start)
+            return success
+
+    pool_size = provider_client.POOL_SIZE_PER_HOST * len(search_lyrics.PLATFORMS)
+    async with provider_client.AsyncProviderClient(base_url=base_url, pool_size=pool_size) as client:
+        await asyncio.gather(*(search_one(song, client, []) for song in warmup_songs))
+        requests_before = sum(providers.requests.values())
+        latencies = []
+        results = await asyncio.gather(*(search_one(song, client, latencies) for song in songs))
+    return latencies, sum(results), sum(providers.requests.values()) - requests_before
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对冲搜索基准测试")
+    parser.add_argument("--songs", type=int, default=200, help="搜索的歌曲数")
+    parser.add_argument("--warmup", type=int, default=50, help="计时前用于预热平台统计的歌曲数")
+    parser.add_argument("--concurrency", type=int, default=4, help="同时搜索的歌曲数")
+    parser.add_argument("--latency", type=float, default=0.03, help="替身平台每个请求的平均延迟（秒）")
+    parser.add_argument("--stall-rate", type=float, default=0.05, help="替身平台请求额外卡住的概率")
+    parser.add_argument("--stall-latency", type=float, default=1.5, help="卡住的请求额外等待的时间（秒）")
+    parser.add_argument("--percentile", type=float, default=0.9, help="对冲等待时间取平台耗时的分位数")
+    args = parser.parse_args()
+
+    provider_client = import_tool_module("provider_client")
+    provider_stats = import_tool_module("provider_stats")
+    search_lyrics = import_tool_module("search_lyrics")
+
+    providers = StandInProviders(song_count=max(args.songs + args.warmup, 1000), latency=args.latency,
+                                 stall_rate=args.stall_rate, stall_latency=args.stall_latency)
+    base_url, stop = run_in_thread(providers)
+    print(f"替身歌词平台: {base_url}，平均延迟 {args.latency * 1000:.0f} ms，"
+          f"{args.stall_rate:.0%} 的请求额外卡住 {args.stall_latency} s，并发 {args.concurrency}，"
+          f"先用 {args.warmup} 首歌预热平台统计")
+    songs = providers.songs[:args.songs]
+    warmup_songs = providers.songs[args.songs:args.songs + args.warmup]
+    try:
+        for mode in ("sequential", "hedge", "race"):
+            with tempfile.TemporaryDirectory() as lyrics_dir, contextlib.redirect_stdout(io.StringIO()):
+                latencies, ok_count, request_count = asyncio.run(bench_mode(
+                    search_lyrics, provider_client, provider_stats, providers, base_url, warmup_songs, songs,
+                    mode, args, lyrics_dir))
+            print(f"{mode:>10}: p50 {percentile(latencies, 0.5) * 1000:.0f} ms，"
+                  f"p95 {percentile(latencies, 0.95) * 1000:.0f} ms，p99 {percentile(latencies, 0.99) * 1000:.0f} ms，"
+                  f"成功 {ok_count}/{len(songs)}，平均每次搜索 {request_count / len(songs):.1f} 个请求")
+    finally:
+        stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""增量更新基准测试：测量在已有歌词库上添加、删除一首歌（/lyrics search、/lyrics delete、目录监听）的耗时
+
+合成语料的每句歌词由随机汉字组成、几乎不重复，歌词索引键和模糊匹配的二元组最多。分别在新建立的索引和
+从快照读取的索引上，测量复制索引、更新单首歌曲和更新模糊匹配预筛的耗时（各重复 3 次取最短，
+排除首次分配内存等一次性开销），并与重新建立索引比较；增量更新不快于重新建立索引的 1/10 时失败。
+
+用法: python benchmarks/bench_incremental_update.py [文件数，默认 5000]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from bench_utils import generate_corpus, import_plugin_module
+
+REPEAT = 3
+
+
+def timed(func):
+    """返回 (func 的结果, 耗时秒数)"""
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def update_one(lyrics_index, lyrics_gate, index, gate, corpus_dir, filename):
+    """按 main.py 的单首歌曲路径更新：复制索引、更新清单中的一个文件、更新预筛，返回各步耗时"""
+    new_index, copy_time = timed(index.copy)
+    manifest = dict(index.manifest)
+    file_path = os.path.join(corpus_dir, filename)
+    if os.path.exists(file_path):
+        stat = os.stat(file_path)
+        manifest[filename] = (stat.st_size, stat.st_mtime_ns)
+    else:
+        manifest.pop(filename, None)
+    _, update_time = timed(lambda: new_index.update(corpus_dir, manifest))
+    new_gate, gate_time = timed(lambda: gate.updated(new_index.key_changes) or lyrics_gate.MatchGate(new_index.entries))
+    return new_index, new_gate, (copy_time, update_time, gate_time)
+
+
+def main():
+    file_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    lyrics_index = import_plugin_module("lyrics_index")
+    lyrics_gate = import_plugin_module("lyrics_gate")
+
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        print(f"生成 {file_count + 1} 个合成歌词文件（歌词几乎不重复）...")
+        generate_corpus(corpus_dir, file_count + 1, unique_lines=True)
+        # 最后一个文件先不加入索引，用于测量添加歌曲
+        added_file = max(lyrics_index.scan_lyrics_dir(corpus_dir))
+        manifest = lyrics_index.scan_lyrics_dir(corpus_dir)
+        manifest.pop(added_file)
+
+        built, build_time = timed(lambda: lyrics_index.LyricsIndex.build(corpus_dir, True, manifest))
+        gate, gate_build_time = timed(lambda: lyrics_gate.MatchGate(built.entries))
+        print(f"{len(built.entries)} 条歌词索引；建立索引 {build_time:.2f} s，建立预筛 {gate_build_time:.2f} s")
+
+        snapshot_path = os.path.join(corpus_dir, "lyrics_index.snapshot")
+        lyrics_index.save_snapshot(built, snapshot_path)
+        loaded = lyrics_index.load_snapshot(snapshot_path, True)
+
+        failed = False
+        for label, index in (("新建立的索引", built), ("从快照读取的索引", loaded)):
+            add_runs, remove_runs = [], []
+            for _ in range(REPEAT):
+                added, added_gate, add_times = update_one(lyrics_index, lyrics_gate, index, gate, corpus_dir, added_file)
+                os.rename(os.path.join(corpus_dir, added_file), os.path.join(corpus_dir, added_file + ".bak"))
+                removed, _, remove_times = update_one(lyrics_index, lyrics_gate, added, added_gate, corpus_dir, added_file)
+                os.rename(os.path.join(corpus_dir, added_file + ".bak"), os.path.join(corpus_dir, added_file))
+                if list(removed.entries) != list(index.entries) or len(added.entries) <= len(index.entries):
+                    print(f"{label}: 增量更新的结果不正确")
+                    sys.exit(1)
+                add_runs.append(add_times)
+                remove_runs.append(remove_times)
+            add_times = [min(step) for step in zip(*add_runs)]
+            remove_times = [min(step) for step in zip(*remove_runs)]
+            for action, (copy_time, update_time, gate_time) in (("添加", add_times), ("删除", remove_times)):
+                total = copy_time + update_time + gate_time
+                print(f"{label}{action}一首歌: 共 {total * 1000:.0f} ms（复制 {copy_time * 1000:.0f} ms，"
+                      f"更新 {update_time * 1000:.0f} ms，预筛 {gate_time * 1000:.0f} ms），"
+                      f"为重新建立索引的 {total / build_time:.1%}")
+                failed = failed or total * 10 > build_time
+        if failed:
+            print("增量更新不快于重新建立索引的 1/10")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
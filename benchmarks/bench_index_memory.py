@@ -0,0 +1,69 @@
+"""索引内存基准测试：用 tracemalloc 比较旧的 {句子: [(下一句, 歌名), ...]} 结构与驻留表 + array 结构
+
+两种结构都从同一批文件解析建立，并同样包含模糊匹配器，统计建立完成后仍占用的内存。
+
+用法: python benchmarks/bench_index_memory.py [文件数，默认 20000]
+"""
+import gc
+import os
+import sys
+import tempfile
+import tracemalloc
+
+from bench_utils import generate_corpus, import_plugin_module
+
+
+def build_legacy(lyrics_index, lyrics_matcher, corpus_dir, manifest):
+    """按改动前的方式建立索引：每个条目是一个 (下一句, 歌名) 元组"""
+    entries = {}
+    info = {}
+    for filename, _, parsed, _ in lyrics_index._parse_files(corpus_dir, True, [(name, None) for name in manifest]):
+        total_lines, pairs = parsed
+        song_name = os.path.splitext(filename)[0]
+        info[song_name] = {"total_lines": total_lines}
+        for current_sentence, next_sentence in pairs:
+            entries.setdefault(current_sentence, []).append((next_sentence, song_name))
+    return entries, info, lyrics_matcher.FuzzyMatcher(entries)
+
+
+def measure(func):
+    """返回 func 的结果及其建立完成后仍占用的内存（字节）"""
+    gc.collect()
+    tracemalloc.start()
+    result = func()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def main():
+    file_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    lyrics_index = import_plugin_module("lyrics_index")
+    lyrics_matcher = import_plugin_module("lyrics_matcher")
+
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        print(f"生成 {file_count} 个合成歌词文件...")
+        generate_corpus(corpus_dir, file_count)
+        manifest = lyrics_index.scan_lyrics_dir(corpus_dir)
+
+        (legacy_entries, _, legacy_matcher), legacy_size = measure(
+            lambda: build_legacy(lyrics_index, lyrics_matcher, corpus_dir, manifest))
+        index, index_size = measure(lambda: lyrics_index.LyricsIndex.build(corpus_dir, True, manifest))
+        matcher_size = measure(lambda: legacy_matcher.copy())[1]
+
+        if any(sorted(index.entries[key]) != sorted(postings) for key, postings in legacy_entries.items()) or \
+                len(index.entries) != len(legacy_entries):
+            print("两种结构的索引内容不一致")
+            sys.exit(1)
+        entry_count = sum(len(postings) for postings in legacy_entries.values())
+        distinct_count = sum(index.fanout(key) for key in index.entries)
+        print(f"{len(index.entries)} 条歌词索引，{entry_count} 个条目（去重后 {distinct_count} 个），"
+              f"{len(index.sentences)} 个不同的下一句，{len(index.songs)} 首歌曲")
+        print(f"模糊匹配器（两者相同）: {matcher_size / 2 ** 20:.1f} MiB")
+        print(f"改动前: {legacy_size / 2 ** 20:.1f} MiB")
+        print(f"驻留表 + array: {index_size / 2 ** 20:.1f} MiB（{index_size / legacy_size:.0%}）")
+
+
+if __name__ == "__main__":
+    main()
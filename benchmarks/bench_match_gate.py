@@ -0,0 +1,71 @@
+"""模糊匹配预筛基准测试：统计预筛拒绝的消息比例，检查没有漏报，并比较预筛与模糊匹配的耗时
+
+测试消息包括改动过几个字的歌词和随机生成的聊天消息（语料字符打乱重排、随机汉字、英文单词）。
+
+用法: python benchmarks/bench_match_gate.py [匹配阈值，默认 0.8]
+"""
+import random
+import string
+import sys
+import time
+
+from bench_utils import DEFAULT_LYRICS_DIR, import_plugin_module
+
+
+def make_messages(keys, count, seed=0):
+    """生成 (消息, 类别) 列表"""
+    rng = random.Random(seed)
+    chars = sorted(set("".join(keys)))
+    messages = []
+    for _ in range(count):
+        kind = rng.choice(("lyrics", "shuffled", "random_cjk", "english"))
+        if kind == "lyrics":
+            text = list(rng.choice(keys))
+            for _ in range(rng.randint(0, 2)):
+                text[rng.randrange(len(text))] = rng.choice(chars)
+            message = "".join(text)
+        elif kind == "shuffled":
+            message = "".join(rng.sample(chars, rng.randint(2, 20)))
+        elif kind == "random_cjk":
+            message = "".join(chr(rng.randint(0x4e00, 0x9fff)) for _ in range(rng.randint(2, 20)))
+        else:
+            message = " ".join("".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 8)))
+                               for _ in range(rng.randint(1, 6)))
+        messages.append((message, kind))
+    return messages
+
+
+def main():
+    threshold = float(sys.argv[1]) if len(sys.argv) > 1 else 0.8
+    lyrics_index = import_plugin_module("lyrics_index")
+    lyrics_gate = import_plugin_module("lyrics_gate")
+
+    index = lyrics_index.LyricsIndex.build(DEFAULT_LYRICS_DIR, True)
+    gate = lyrics_gate.MatchGate(index.entries)
+    messages = make_messages(list(index.entries), 4000)
+
+    rejected_by_kind = {}
+    total_by_kind = {}
+    gate_time = match_time = 0.0
+    for message, kind in messages:
+        start = time.perf_counter()
+        may_match = gate.may_match(message, threshold)
+        gate_time += time.perf_counter() - start
+        start = time.perf_counter()
+        match = index.matcher.best_match(message, threshold)
+        match_time += time.perf_counter() - start
+        if not may_match and match is not None:
+            print(f"预筛漏报: {message!r} -> {match}")
+            sys.exit(1)
+        total_by_kind[kind] = total_by_kind.get(kind, 0) + 1
+        rejected_by_kind[kind] = rejected_by_kind.get(kind, 0) + (not may_match)
+
+    print(f"{len(messages)} 条消息，匹配阈值 {threshold}，没有漏报")
+    for kind, total in total_by_kind.items():
+        print(f"  {kind}: 拒绝 {rejected_by_kind[kind]}/{total}（{rejected_by_kind[kind] / total:.1%}）")
+    print(f"总拒绝比例: {gate.rejected / gate.checked:.1%}")
+    print(f"预筛: {gate_time / len(messages) * 1e6:.1f} µs/条，模糊匹配: {match_time / len(messages) * 1e6:.1f} µs/条")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""歌词预处理基准测试：对比旧的逐步正则替换实现与 normalize_lyrics
+
+用法: python benchmarks/bench_normalizer.py [歌词目录]
+"""
+import re
+import sys
+
+from bench_utils import DEFAULT_LYRICS_DIR, best_of, import_plugin_module, read_corpus_lines
+
+
+def legacy_preprocess_lyrics(lyrics):
+    """旧版 SingAlongPlugin._preprocess_lyrics 的实现，作为对照"""
+    processed = re.sub(r'\[表情:\d+\]', '', lyrics)
+    processed = re.sub(r'\[[^\]]*\]', '', processed)
+    emoji_pattern = re.compile(
+        "["
+        "\U0001F600-\U0001F64F"
+        "\U0001F300-\U0001F5FF"
+        "\U0001F680-\U0001F6FF"
+        "\U0001F1E0-\U0001F1FF"
+        "\U00002700-\U000027BF"
+        "\U0001F900-\U0001F9FF"
+        "\U0001FA70-\U0001FAFF"
+        "\U00002600-\U000026FF"
+        "\U0001F780-\U0001F7FF"
+        "]+", flags=re.UNICODE)
+    processed = emoji_pattern.sub('', processed)
+    processed = re.sub(r'[^a-zA-Z0-9\u4e00-\u9fff\u3040-\u30ff\uff66-\uff9f\s]', '', processed)
+    processed = re.sub(r'\s+', ' ', processed).strip()
+    return processed.lower()
+
+
+def main():
+    lyrics_dir = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_LYRICS_DIR
+    normalize_lyrics = import_plugin_module("lyrics_normalizer").normalize_lyrics
+
+    lines = read_corpus_lines(lyrics_dir)
+    # 额外加入带 QQ 表情、emoji 和标点的聊天消息
+    lines += [f"[表情:{i}]{line}😀！[doge]" for i, line in enumerate(lines[:500])]
+
+    mismatches = [line for line in lines if legacy_preprocess_lyrics(line) != normalize_lyrics(line)]
+    if mismatches:
+        print(f"输出不一致: {len(mismatches)} 行，例如 {mismatches[0]!r}")
+        sys.exit(1)
+    print(f"语料: {len(lines)} 行，两种实现的输出完全一致")
+
+    legacy_time = best_of(lambda: [legacy_preprocess_lyrics(line) for line in lines])
+    fast_time = best_of(lambda: [normalize_lyrics(line) for line in lines])
+    print(f"旧实现: {legacy_time * 1000:.1f} ms ({legacy_time / len(lines) * 1e6:.2f} µs/行)")
+    print(f"新实现: {fast_time * 1000:.1f} ms ({fast_time / len(lines) * 1e6:.2f} µs/行)")
+    print(f"加速比: {legacy_time / fast_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""并行解析基准测试：在合成语料上比较不同进程数建立歌词索引的耗时
+
+用法: python benchmarks/bench_parallel_parse.py [文件数，默认 20000]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from bench_utils import generate_corpus, import_plugin_module
+
+WORKER_COUNTS = (1, 2, 4, 8)
+
+
+def main():
+    file_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    lyrics_index = import_plugin_module("lyrics_index")
+
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        print(f"生成 {file_count} 个合成歌词文件...")
+        generate_corpus(corpus_dir, file_count)
+        manifest = lyrics_index.scan_lyrics_dir(corpus_dir)
+        print(f"CPU 核心数: {os.cpu_count()}")
+
+        baseline_time = None
+        baseline_entries = None
+        for workers in WORKER_COUNTS:
+            start = time.perf_counter()
+            index = lyrics_index.LyricsIndex.build(corpus_dir, True, manifest, workers=workers)
+            elapsed = time.perf_counter() - start
+
+            if baseline_entries is None:
+                baseline_time, baseline_entries = elapsed, index.entries
+            elif index.entries != baseline_entries or list(index.entries) != list(baseline_entries):
+                print(f"{workers} 个进程的索引与单进程结果不一致")
+                sys.exit(1)
+            print(f"{workers} 个进程: {elapsed:.2f} s，{file_count / elapsed:.0f} 文件/s，"
+                  f"加速比 {baseline_time / elapsed:.2f}x，{len(index.entries)} 条歌词索引")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""索引快照基准测试：比较从歌词文件建立索引与读取索引快照的耗时，快照读取不快于建立索引时失败
+
+合成语料的每句歌词由随机汉字组成、几乎不重复，歌词索引键和模糊匹配的二元组最多，是快照读取最慢的情形。
+读取后检查歌词索引和模糊匹配结果与建立的索引一致。
+
+用法: python benchmarks/bench_snapshot.py [文件数，默认 5000]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+from bench_utils import generate_corpus, import_plugin_module
+
+
+def timed(func):
+    """返回 (func 的结果, 耗时秒数)"""
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    file_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    lyrics_index = import_plugin_module("lyrics_index")
+
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        print(f"生成 {file_count} 个合成歌词文件（歌词几乎不重复）...")
+        generate_corpus(corpus_dir, file_count, unique_lines=True)
+        manifest = lyrics_index.scan_lyrics_dir(corpus_dir)
+        snapshot_path = os.path.join(corpus_dir, "lyrics_index.snapshot")
+
+        index, build_time = timed(lambda: lyrics_index.LyricsIndex.build(corpus_dir, True, manifest))
+        _, save_time = timed(lambda: lyrics_index.save_snapshot(index, snapshot_path))
+        loaded, load_time = timed(lambda: lyrics_index.load_snapshot(snapshot_path, True))
+
+        if (loaded is None or list(loaded.entries) != list(index.entries) or
+                any(loaded.lookup(key) != index.lookup(key) for key in index.entries) or
+                loaded.song_keys != index.song_keys or loaded.manifest != index.manifest):
+            print("快照读取的索引与建立的索引不一致")
+            sys.exit(1)
+        rng = random.Random(0)
+        for key in rng.sample(list(index.entries), min(200, len(index.entries))):
+            query = key[:-1] + "啊"
+            if loaded.matcher.best_match(query, 0.7) != index.matcher.best_match(query, 0.7):
+                print(f"快照读取的模糊匹配结果与建立的索引不一致: {query}")
+                sys.exit(1)
+
+        print(f"{len(index.entries)} 条歌词索引，"
+              f"快照 {os.path.getsize(snapshot_path) / 2 ** 20:.1f} MiB")
+        print(f"建立索引: {build_time:.2f} s")
+        print(f"保存快照: {save_time:.2f} s")
+        print(f"读取快照: {load_time:.2f} s（{build_time / load_time:.1f}x）")
+        if load_time >= build_time:
+            print("读取快照不快于重新建立索引")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""基准测试的公共工具：以包的形式导入插件模块、导入 tools 脚本、读取歌词语料、生成合成语料、计时"""
+import importlib
+import math
+import os
+import random
+import sys
+import time
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_LYRICS_DIR = os.path.join(PLUGIN_DIR, "data", "lyrics")
+TOOLS_DIR = os.path.join(PLUGIN_DIR, "tools")
+
+
+def import_plugin_module(name):
+    """导入插件目录下的模块（插件模块之间使用相对导入，需以包的形式导入）"""
+    parent_dir = os.path.dirname(PLUGIN_DIR)
+    if parent_dir not in sys.path:
+        sys.path.insert(0, parent_dir)
+    return importlib.import_module(f"{os.path.basename(PLUGIN_DIR)}.{name}")
+
+
+def import_tool_module(name):
+    """导入 tools 目录下的脚本（脚本之间按模块名直接导入，需把 tools 目录加入 sys.path）"""
+    if TOOLS_DIR not in sys.path:
+        sys.path.insert(0, TOOLS_DIR)
+    return importlib.import_module(name)
+
+
+def percentile(values, fraction):
+    """返回 values 的 fraction 分位数（最近秩法）"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+def read_corpus_lines(lyrics_dir=DEFAULT_LYRICS_DIR):
+    """读取歌词目录下所有非空行"""
+    lines = []
+    for filename in sorted(os.listdir(lyrics_dir)):
+        if filename.endswith(".txt"):
+            with open(os.path.join(lyrics_dir, filename), 'r', encoding='utf-8') as f:
+                lines.extend(line.strip() for line in f if line.strip())
+    return lines
+
+
+def generate_corpus(target_dir, file_count, seed=0, unique_lines=False):
+    """用内置歌词的句子随机拼出 file_count 个歌词文件
+
+    unique_lines 为 True 时每句由内置歌词中的汉字随机组成，几乎不会重复，歌词索引键和二元组最多。
+    """
+    rng = random.Random(seed)
+    lines = read_corpus_lines()
+    chars = sorted({char for line in lines for char in line if '\u4e00' <= char <= '\u9fff'})
+    for i in range(file_count):
+        if unique_lines:
+            song_lines = ["".join(rng.choices(chars, k=rng.randint(6, 14))) for _ in range(rng.randint(30, 50))]
+        else:
+            song_lines = rng.sample(lines, rng.randint(30, 60))
+        with open(os.path.join(target_dir, f"合成歌曲{i:05d}.txt"), 'w', encoding='utf-8') as f:
+            f.write("\n".join(song_lines))
+
+
+def best_of(func, repeat=5):
+    """重复执行 func，返回最短耗时（秒）"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
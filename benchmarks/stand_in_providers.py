@@ -0,0 +1,256 @@
+"""本地替身歌词平台：模拟网易云音乐、QQ 音乐、酷狗音乐接口的 JSON 结构，用于在没有网络的环境中测试和评估下载流程
+
+响应结构与 tools/search_lyrics.py、tools/fetch_lyrics.py 解析的字段一致：网易云音乐 result.songs /
+result.artists / hotSongs / lrc.lyric，QQ 音乐 req_0.data.body.song.list / singer.list /
+singer.data.songlist 和 Base64 编码的 lyric，酷狗音乐 data.info、candidates 和 Base64 编码的 content。
+请求路径为 /{平台主机}{接口路径}，与 provider_client.rewrite_url 的改写方式对应。
+
+合成曲库共 song_count 首歌，第 i 首名为「合成歌曲{i:05d}」，歌手为「合成歌手{i % artist_count:03d}」，
+歌词由内置歌词的句子按固定种子随机拼成。每个请求等待 latency 秒（按 jitter 上下浮动）后响应，
+以 stall_rate 的概率再额外卡住 stall_latency 秒，并以 error_rate 的概率返回 503。
+
+用法: python benchmarks/stand_in_providers.py [--port 8900] [--songs 1000] [--latency 0.02] [--error-rate 0.05]
+然后设置 SINGALONG_PROVIDER_BASE_URL=http://127.0.0.1:8900 运行 tools 下的脚本。
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import random
+import threading
+
+from aiohttp import web
+
+from bench_utils import read_corpus_lines
+
+PROVIDERS = ("netease", "qq", "kugou")
+
+
+def _lrc(lines):
+    """把歌词句子加上时间标签，拼成 LRC 格式"""
+    return "\n".join(f"[{i * 4 // 60:02d}:{i * 4 % 60:02d}.00]{line}" for i, line in enumerate(lines))
+
+
+def _b64(text):
+    return base64.b64encode(text.encode("utf-8")).decode("ascii")
+
+
+class StandInProviders:
+    """替身歌词平台；latency、error_rate 可按平台分别覆盖（provider_latency、provider_error_rate）"""
+
+    def __init__(self, song_count=1000, artist_count=20, latency=0.02, jitter=0.5, error_rate=0.0,
+                 provider_latency=None, provider_error_rate=None, stall_rate=0.0, stall_latency=2.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.stall_rate = stall_rate
+        self.stall_latency = stall_latency
+        self.provider_latency = dict(provider_latency or {})
+        self.provider_error_rate = dict(provider_error_rate or {})
+        self._rng = random.Random(seed)
+        self.requests = {provider: 0 for provider in PROVIDERS}
+        self.errors = {provider: 0 for provider in PROVIDERS}
+
+        corpus = read_corpus_lines()
+        corpus_rng = random.Random(seed)
+        self.artists = [f"合成歌手{i:03d}" for i in range(artist_count)]
+        self.songs = []
+        for i in range(song_count):
+            name = f"合成歌曲{i:05d}"
+            self.songs.append({
+                "index": i,
+                "name": name,
+                "artist": self.artists[i % artist_count],
+                "lrc": f"[ti:{name}]\n" + _lrc(corpus_rng.sample(corpus, corpus_rng.randint(30, 60))),
+                "hash": hashlib.md5(name.encode("utf-8")).hexdigest().upper(),
+            })
+        self._by_name = {song["name"]: song for song in self.songs}
+        self._by_hash = {song["hash"]: song for song in self.songs}
+        self._by_artist = {}
+        for song in self.songs:
+            self._by_artist.setdefault(song["artist"], []).append(song)
+
+        self.app = web.Application()
+        routes = (
+            ("netease", "/music.163.com/api/search/get", self._netease_search),
+            ("netease", "/music.163.com/api/v1/artist/{artist_id}", self._netease_artist),
+            ("netease", "/music.163.com/api/song/lyric", self._netease_lyric),
+            ("qq", "/u.y.qq.com/cgi-bin/musicu.fcg", self._qq_musicu),
+            ("qq", "/c.y.qq.com/lyric/fcgi-bin/fcg_query_lyric_new.fcg", self._qq_lyric),
+            ("kugou", "/mobilecdn.kugou.com/api/v3/search/song", self._kugou_search),
+            ("kugou", "/krcs.kugou.com/search", self._kugou_candidates),
+            ("kugou", "/lyrics.kugou.com/download", self._kugou_download),
+        )
+        for provider, path, handler in routes:
+            self.app.router.add_get(path, self._wrap(provider, handler))
+        self._runner = None
+
+    def _wrap(self, provider, handler):
+        async def wrapped(request):
+            self.requests[provider] += 1
+            latency = self.provider_latency.get(provider, self.latency)
+            delay = latency * self._rng.uniform(1 - self.jitter, 1 + self.jitter)
+            if self._rng.random() < self.stall_rate:
+                delay += self.stall_latency
+            await asyncio.sleep(delay)
+            if self._rng.random() < self.provider_error_rate.get(provider, self.error_rate):
+                self.errors[provider] += 1
+                return web.Response(status=503, text="service unavailable")
+            # 与真实平台一样以 text/plain 返回 JSON，调用方需自行解析
+            return web.Response(text=json.dumps(handler(request), ensure_ascii=False))
+        return wrapped
+
+    def search(self, term):
+        """按搜索词中的歌名和歌手名查找歌曲：每个词须等于歌名或歌手名"""
+        matches = None
+        for token in term.split():
+            if token in self._by_name:
+                found = [self._by_name[token]]
+            else:
+                found = self._by_artist.get(token, [])
+            matches = found if matches is None else [song for song in matches if song in found]
+        return matches or []
+
+    # 网易云音乐
+    def _netease_search(self, request):
+        term = request.query.get("s", "")
+        limit = int(request.query.get("limit", 30))
+        if request.query.get("type") == "100":
+            artists = [{"id": 1000 + self.artists.index(token), "name": token}
+                       for token in term.split() if token in self._by_artist]
+            return {"result": {"artists": artists[:limit]}, "code": 200}
+        songs = [{"id": 100000 + song["index"], "name": song["name"], "artists": [{"name": song["artist"]}]}
+                 for song in self.search(term)[:limit]]
+        return {"result": {"songs": songs}, "code": 200}
+
+    def _netease_artist(self, request):
+        artist_index = int(request.match_info["artist_id"]) - 1000
+        if not 0 <= artist_index < len(self.artists):
+            return {"code": 404}
+        return {"hotSongs": [{"id": 100000 + song["index"], "name": song["name"]}
+                             for song in self._by_artist.get(self.artists[artist_index], [])], "code": 200}
+
+    def _netease_lyric(self, request):
+        index = int(request.query.get("id", 0)) - 100000
+        if not 0 <= index < len(self.songs):
+            return {"code": 200, "nolyric": True}
+        return {"lrc": {"version": 1, "lyric": self.songs[index]["lrc"]}, "code": 200}
+
+    # QQ 音乐
+    def _qq_musicu(self, request):
+        data = json.loads(request.query.get("data", "{}"))
+        if "singer" in data:
+            mid = data["singer"]["param"]["singermid"]
+            songs = []
+            if mid.startswith("qqsinger"):
+                songs = self._by_artist.get(self.artists[int(mid[len("qqsinger"):])], [])
+            return {"singer": {"data": {"songlist": [
+                {"id": song["index"], "mid": f"qqmid{song['index']:06d}", "name": song["name"]} for song in songs
+            ]}}}
+        param = data.get("req_0", {}).get("param", {})
+        term = param.get("query", "")
+        count = int(param.get("num_per_page", 20))
+        if param.get("search_type") == 9:
+            singers = [{"name": token, "mid": f"qqsinger{self.artists.index(token)}"}
+                       for token in term.split() if token in self._by_artist]
+            return {"req_0": {"data": {"body": {"singer": {"list": singers[:count]}}}}}
+        songs = [{"title": song["name"], "mid": f"qqmid{song['index']:06d}", "singer": [{"name": song["artist"]}]}
+                 for song in self.search(term)[:count]]
+        return {"req_0": {"data": {"body": {"song": {"list": songs}}}}}
+
+    def _qq_lyric(self, request):
+        mid = request.query.get("songmid", "")
+        index = int(mid[len("qqmid"):]) if mid.startswith("qqmid") else -1
+        if not 0 <= index < len(self.songs):
+            return {"retcode": -1901}
+        return {"retcode": 0, "code": 0, "lyric": _b64(self.songs[index]["lrc"])}
+
+    # 酷狗音乐
+    def _kugou_search(self, request):
+        page = int(request.query.get("page", 1))
+        page_size = int(request.query.get("pagesize", 20))
+        songs = self.search(request.query.get("keyword", ""))[(page - 1) * page_size:page * page_size]
+        return {"status": 1, "data": {"info": [
+            {"songname": song["name"], "singername": song["artist"], "hash": song["hash"], "duration": 240}
+            for song in songs
+        ]}}
+
+    def _kugou_candidates(self, request):
+        song = self._by_hash.get(request.query.get("hash", ""))
+        if song is None:
+            return {"status": 200, "candidates": []}
+        return {"status": 200, "candidates": [{"id": str(song["index"]), "accesskey": song["hash"][:8]}]}
+
+    def _kugou_download(self, request):
+        lyrics_id = request.query.get("id", "")
+        index = int(lyrics_id) if lyrics_id.isdigit() else -1
+        if not 0 <= index < len(self.songs) or request.query.get("accesskey") != self.songs[index]["hash"][:8]:
+            return {"status": 404}
+        return {"status": 200, "content": _b64(self.songs[index]["lrc"])}
+
+    async def start(self, host="127.0.0.1", port=0):
+        """启动服务，返回替身平台的根地址（port 为 0 时使用随机空闲端口）"""
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_host, bound_port = self._runner.addresses[0][:2]
+        return f"http://{bound_host}:{bound_port}"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+def run_in_thread(providers, host="127.0.0.1", port=0):
+    """在后台线程的事件循环中启动替身平台，返回 (根地址, 停止函数)"""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    base_url = asyncio.run_coroutine_threadsafe(providers.start(host, port), loop).result()
+
+    def stop():
+        asyncio.run_coroutine_threadsafe(providers.stop(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+    return base_url, stop
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地替身歌词平台")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--songs", type=int, default=1000, help="合成曲库的歌曲数")
+    parser.add_argument("--artists", type=int, default=20, help="合成曲库的歌手数")
+    parser.add_argument("--latency", type=float, default=0.02, help="每个请求的平均延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.5, help="延迟的上下浮动比例")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回 503 的概率")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="请求额外卡住的概率")
+    parser.add_argument("--stall-latency", type=float, default=2.0, help="卡住的请求额外等待的时间（秒）")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    providers = StandInProviders(args.songs, args.artists, args.latency, args.jitter, args.error_rate,
+                                 stall_rate=args.stall_rate, stall_latency=args.stall_latency, seed=args.seed)
+
+    async def serve():
+        base_url = await providers.start(args.host, args.port)
+        print(f"替身歌词平台已启动: {base_url}（{len(providers.songs)} 首歌曲，{len(providers.artists)} 位歌手）")
+        print(f"运行 tools 下的脚本前设置 SINGALONG_PROVIDER_BASE_URL={base_url}")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await providers.stop()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
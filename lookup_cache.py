@@ -0,0 +1,61 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+# 缓存未命中时 get 返回的哨兵值，用于和“已缓存的无匹配结果 None”区分
+MISSING = object()
+
+
+class LookupCache:
+    """歌词查找结果的 LRU 缓存
+
+    缓存消息到匹配结果（歌词索引键）的映射，包括“没有匹配”的结果。每个条目带有过期时间，
+    容量满时淘汰最久未使用的条目。缓存绑定一个代际标识（索引版本与影响匹配的配置），
+    代际变化时整体丢弃旧条目，旧代际下算出的结果也不会再写入。
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # 消息 -> (过期时间, 匹配结果)
+        self._generation: Optional[Hashable] = None
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _sync_generation(self, generation: Hashable):
+        """代际变化时一次性换掉所有条目"""
+        if generation != self._generation:
+            self._entries = OrderedDict()
+            self._generation = generation
+
+    def get(self, message: str, generation: Hashable) -> Any:
+        """查询缓存，未命中或已过期时返回 MISSING"""
+        if self.max_size <= 0:
+            return MISSING
+        self._sync_generation(generation)
+        entry = self._entries.get(message)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[message]
+            self.misses += 1
+            return MISSING
+        self._entries.move_to_end(message)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, message: str, value: Any, generation: Hashable):
+        """写入缓存；若代际已经变化（计算期间索引被重建），则丢弃该结果"""
+        if self.max_size <= 0 or generation != self._generation:
+            return
+        self._entries[message] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(message)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self):
+        """清空缓存"""
+        self._entries = OrderedDict()
+        self._generation = None
@@ -0,0 +1,146 @@
+import bisect
+import math
+from typing import Iterable, List, Optional, Tuple
+
+from .lyrics_matcher import _min_matches
+
+
+class BloomFilter:
+    """字符串集合的布隆过滤器：可能误报存在，但不会漏报"""
+
+    HASH_COUNT = 3
+
+    def __init__(self, expected_items: int, bits_per_item: int = 16):
+        self.capacity = expected_items  # 按该数量设定位数，加入的元素明显超过它时误报率上升
+        self.size = max(64, expected_items * bits_per_item)
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def copy(self) -> "BloomFilter":
+        bloom = BloomFilter.__new__(BloomFilter)
+        bloom.capacity, bloom.size, bloom._bits = self.capacity, self.size, bytearray(self._bits)
+        return bloom
+
+    def _positions(self, item: str):
+        # 双重哈希：由一个哈希值派生出 HASH_COUNT 个位置
+        h = hash(item)
+        h1 = h & 0xFFFFFFFF
+        h2 = (h >> 32) | 1
+        return [(h1 + i * h2) % self.size for i in range(self.HASH_COUNT)]
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        # 与 _positions 相同的位置，逐个检查以便尽早返回
+        h = hash(item)
+        h1 = h & 0xFFFFFFFF
+        h2 = (h >> 32) | 1
+        size, bits = self.size, self._bits
+        for i in range(self.HASH_COUNT):
+            position = (h1 + i * h2) % size
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+class MatchGate:
+    """模糊匹配前的预筛：快速排除不可能达到匹配阈值的消息
+
+    记录歌词索引键中出现过的字符集合和字符二元组（布隆过滤器）。消息中只有出现在字符集合中的
+    字符才可能成为匹配字符，因此匹配字符数 M 不超过这些字符的个数；共享二元组数 S 不超过
+    布隆过滤器认为存在的消息二元组个数。结合 FuzzyMatcher 的剪枝条件 S >= 3M - la - lb - 1，
+    对每个候选长度判断是否仍可能达到阈值，全部不可能时拒绝。两个上界都只会偏大，不会漏掉
+    任何能达到阈值的消息。
+
+    歌词索引增删少量歌词键时用 updated 得到加入新键的副本，无需重新建立；已删除的键仍留在
+    字符集合、长度和布隆过滤器中，只会让预筛偏宽松，累计过多时 updated 要求重新建立。
+    """
+
+    # 已删除的键超过现有键数的该比例，或加入的二元组超过布隆过滤器容量的该倍数时，重新建立
+    MAX_STALE_RATIO = 0.25
+    MAX_BIGRAM_GROWTH = 1.25
+
+    def __init__(self, keys: Iterable[str]):
+        keys = list(keys)
+        self.chars = set()  # 歌词索引键中出现过的字符
+        lengths = set()
+        bigram_count = 0
+        for key in keys:
+            self.chars.update(key)
+            lengths.add(len(key))
+            bigram_count += max(0, len(key) - 1)
+        self.lengths = sorted(lengths)  # 歌词索引键的长度，升序
+        self.bigrams = BloomFilter(bigram_count)
+        for key in keys:
+            for i in range(len(key) - 1):
+                self.bigrams.add(key[i:i + 2])
+        self.key_count = len(keys)  # 现有的歌词索引键数
+        self.bigram_count = bigram_count  # 加入布隆过滤器的二元组数（含已删除的键）
+        self.stale_count = 0  # 已删除但仍留在预筛中的键数
+        self.checked = 0  # 经过预筛的消息数
+        self.rejected = 0  # 被预筛拒绝的消息数
+
+    def updated(self, key_changes: List[Tuple[str, bool]]) -> Optional["MatchGate"]:
+        """返回按歌词索引键的增删（LyricsIndex.key_changes）更新后的副本，自身不变；需要重新建立时返回 None"""
+        added = [key for key, is_added in key_changes if is_added]
+        removed_count = len(key_changes) - len(added)
+        key_count = self.key_count + len(added) - removed_count
+        stale_count = self.stale_count + removed_count
+        bigram_count = self.bigram_count + sum(max(0, len(key) - 1) for key in added)
+        if (stale_count > key_count * self.MAX_STALE_RATIO or
+                bigram_count > self.bigrams.capacity * self.MAX_BIGRAM_GROWTH):
+            return None
+        gate = MatchGate.__new__(MatchGate)
+        gate.chars = set(self.chars)
+        gate.lengths = list(self.lengths)
+        gate.bigrams = self.bigrams.copy()
+        for key in added:
+            gate.chars.update(key)
+            if len(key) not in gate.lengths:
+                bisect.insort(gate.lengths, len(key))
+            for i in range(len(key) - 1):
+                gate.bigrams.add(key[i:i + 2])
+        gate.key_count, gate.bigram_count, gate.stale_count = key_count, bigram_count, stale_count
+        gate.checked, gate.rejected = self.checked, self.rejected
+        return gate
+
+    def may_match(self, query: str, threshold: float) -> bool:
+        """query 是否可能与某条歌词索引键的相似度达到阈值"""
+        self.checked += 1
+        query_length = len(query)
+        # 与 FuzzyMatcher 相同的长度窗口（浮点估算，下面逐个精确判断）
+        if threshold <= 0:
+            lengths = self.lengths
+        elif threshold > 1:
+            lengths = []
+        else:
+            low = math.floor(threshold * query_length / (2 - threshold)) - 1
+            high = math.ceil(query_length * (2 - threshold) / threshold) + 1
+            lengths = self.lengths[bisect.bisect_left(self.lengths, low):bisect.bisect_right(self.lengths, high)]
+
+        if lengths:
+            # 先用字符集合求 M 的上界，排除所需匹配字符数过多的长度
+            chars = self.chars
+            max_matches = sum(1 for char in query if char in chars)
+            min_shared = None  # 剩余长度中所需的最少共享二元组数
+            for length in lengths:
+                need = _min_matches(query_length + length, threshold)
+                if need <= min(max_matches, length):
+                    required = 3 * need - query_length - length - 1
+                    if min_shared is None or required < min_shared:
+                        min_shared = required
+            # 再用布隆过滤器求 S 的上界，达到所需数量即可放行
+            if min_shared is not None:
+                shared = 0
+                bigrams = self.bigrams
+                for i in range(query_length - 1):
+                    if shared >= min_shared:
+                        break
+                    if query[i:i + 2] in bigrams:
+                        shared += 1
+                if shared >= min_shared:
+                    return True
+
+        self.rejected += 1
+        return False
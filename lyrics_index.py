@@ -0,0 +1,493 @@
+import gc
+import hashlib
+import os
+import pickle
+import random
+from array import array
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Any, Dict, List, Optional, Tuple
+
+from .lyrics_matcher import FuzzyMatcher
+from .lyrics_normalizer import normalize_lyrics
+from .title_index import TitleIndex
+
+# 索引快照格式版本，索引结构变化时递增，旧快照会被自动忽略
+SNAPSHOT_VERSION = 6
+
+# 待解析文件少于该数量时不启用多进程解析，避免进程启动开销超过收益
+PARALLEL_PARSE_MIN_FILES = 64
+
+
+def contains_chinese(text: str) -> bool:
+    """检测文本是否包含汉字"""
+    for char in text:
+        if '\u4e00' <= char <= '\u9fff':
+            return True
+    return False
+
+
+def split_sentences(lines: List[str]) -> List[str]:
+    """将歌词行拆分为句子，并过滤掉信息行、标题行和无效句子"""
+    # 首先将所有行拆分成句子（如果一行内有空格分隔的多句）
+    sentences = []
+    for line in lines:
+        # 先过滤掉明显的信息行和标题行
+        if (':' in line or '：' in line or  # 包含冒号的信息行
+                ' - ' in line or  # 包含连字符的标题行（歌曲-歌手）
+                '(' in line and ')' in line):  # 包含括号的标题行
+            continue
+        # 检测行内是否有空格分隔的多句歌词
+        if ' ' in line.strip():
+            # 只有包含汉字的歌词才进行空格拆分，英文歌不拆分
+            if contains_chinese(line):
+                # 将一行拆分成多句
+                parts = [part.strip() for part in line.split(' ') if part.strip()]
+                sentences.extend(parts)
+            else:
+                sentences.append(line.strip())
+        else:
+            sentences.append(line.strip())
+
+    # 过滤掉空句子和无效句子
+    filtered_sentences = []
+    for sentence in sentences:
+        if (sentence and
+                len(sentence) > 1 and  # 过滤单字符
+                not sentence.isdigit() and  # 过滤纯数字
+                not all(c in '()[]{}' for c in sentence)):  # 过滤纯括号
+            filtered_sentences.append(sentence)
+    return filtered_sentences
+
+
+def hash_content(data: bytes) -> str:
+    """计算歌词文件内容的哈希"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def parse_lyrics_data(data: bytes, preprocess: bool) -> Tuple[int, List[Tuple[str, str]]]:
+    """解析歌词文件内容，返回 (非空行数, [(歌词索引键, 下一句), ...])"""
+    # 与文本模式读取一致：统一换行符后按行拆分
+    text = data.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+    lines = [line.strip() for line in text.split('\n') if line.strip()]
+
+    filtered_sentences = split_sentences(lines)
+
+    # 建立句子到下一句的索引
+    pairs = []
+    for i in range(len(filtered_sentences) - 1):
+        current_sentence = normalize_lyrics(filtered_sentences[i]) if preprocess else filtered_sentences[i]
+        if not current_sentence.strip():
+            continue
+        pairs.append((current_sentence, filtered_sentences[i + 1]))
+    return len(lines), pairs
+
+
+def parse_lyrics_file(file_path: str, preprocess: bool) -> Tuple[int, List[Tuple[str, str]]]:
+    """解析歌词文件，返回 (非空行数, [(歌词索引键, 下一句), ...])"""
+    with open(file_path, 'rb') as f:
+        return parse_lyrics_data(f.read(), preprocess)
+
+
+def read_lyrics_preview(file_path: str, limit: int, chunk_size: int = 4096) -> Tuple[str, bool]:
+    """读取歌词文件去除首尾空白后的前 limit 个字符，返回 (内容, 是否被截断)
+
+    按块读取，读到足够的字符后立即停止，结果与读取整个文件后 strip() 再截断一致。
+    """
+    content = ""  # 已读内容去除首尾空白后的部分
+    whitespace = ""  # content 之后的空白，后面出现非空白字符时才计入内容，最多保留 limit 个
+    with open(file_path, 'r', encoding='utf-8') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return content, False
+            text = (whitespace + chunk) if content else chunk.lstrip()
+            stripped = text.rstrip()
+            content += stripped
+            whitespace = text[len(stripped):][:limit] if content else ""
+            if len(content) > limit:
+                return content[:limit], True
+
+
+def _parse_files(lyrics_dir: str, preprocess: bool,
+                 items: List[Tuple[str, Optional[str]]]) -> List[Tuple[str, Optional[str], Any, Optional[str]]]:
+    """解析一批歌词文件；items 为 [(文件名, 已知的内容哈希), ...]
+
+    返回 [(文件名, 内容哈希, 解析结果, 错误信息), ...]，内容哈希与已知哈希相同时解析结果为 None。
+    """
+    results = []
+    for filename, known_hash in items:
+        try:
+            with open(os.path.join(lyrics_dir, filename), 'rb') as f:
+                data = f.read()
+            content_hash = hash_content(data)
+            parsed = parse_lyrics_data(data, preprocess) if content_hash != known_hash else None
+            results.append((filename, content_hash, parsed, None))
+        except Exception as e:
+            results.append((filename, None, None, str(e)))
+    return results
+
+
+def _parse_files_parallel(lyrics_dir: str, preprocess: bool, items: List[Tuple[str, Optional[str]]],
+                          workers: int) -> List[Tuple[str, Optional[str], Any, Optional[str]]]:
+    """在进程池中分块解析歌词文件，结果顺序与 items 一致"""
+    chunk_size = max(PARALLEL_PARSE_MIN_FILES // 4, len(items) // (workers * 4) + 1)
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk_results in executor.map(_parse_files, repeat(lyrics_dir), repeat(preprocess), chunks):
+            results.extend(chunk_results)
+    return results
+
+
+def scan_lyrics_dir(lyrics_dir: str) -> Dict[str, Tuple[int, int]]:
+    """扫描歌词目录，返回 {文件名: (文件大小, 修改时间)}，顺序与 os.listdir 一致"""
+    manifest = {}
+    for filename in os.listdir(lyrics_dir):
+        if filename.endswith(".txt"):
+            stat = os.stat(os.path.join(lyrics_dir, filename))
+            manifest[filename] = (stat.st_size, stat.st_mtime_ns)
+    return manifest
+
+
+class StringTable:
+    """字符串驻留表：相同的字符串只存一份，以整数 ID 引用，引用计数归零后回收 ID"""
+
+    def __init__(self):
+        self.strings: List[Optional[str]] = []  # ID -> 字符串，已回收的为 None
+        self.ids: Dict[str, int] = {}  # 字符串 -> ID
+        self.refs = array('I')  # ID -> 引用计数
+        self.free: List[int] = []  # 可复用的 ID
+
+    def __getitem__(self, string_id: int) -> str:
+        return self.strings[string_id]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def acquire(self, string: str) -> int:
+        """返回字符串的 ID 并增加引用计数"""
+        string_id = self.ids.get(string)
+        if string_id is None:
+            if self.free:
+                string_id = self.free.pop()
+                self.strings[string_id] = string
+            else:
+                string_id = len(self.strings)
+                self.strings.append(string)
+                self.refs.append(0)
+            self.ids[string] = string_id
+        self.refs[string_id] += 1
+        return string_id
+
+    def release(self, string_id: int):
+        """减少引用计数，归零时回收 ID"""
+        self.refs[string_id] -= 1
+        if not self.refs[string_id]:
+            del self.ids[self.strings[string_id]]
+            self.strings[string_id] = None
+            self.free.append(string_id)
+
+    def copy(self) -> "StringTable":
+        table = StringTable()
+        table.strings = list(self.strings)
+        table.ids = dict(self.ids)
+        table.refs = array('I', self.refs)
+        table.free = list(self.free)
+        return table
+
+
+class EntriesView(Mapping):
+    """以 {歌词句子: [(下一句, 歌名), ...]} 的形式只读访问紧凑存储的歌词索引"""
+
+    def __init__(self, index: "LyricsIndex"):
+        self._index = index
+
+    def __getitem__(self, key: str) -> List[Tuple[str, str]]:
+        return self._index.lookup(key)
+
+    def __contains__(self, key) -> bool:
+        return key in self._index.postings
+
+    def __iter__(self):
+        return iter(self._index.postings)
+
+    def __len__(self) -> int:
+        return len(self._index.postings)
+
+
+class LyricsIndex:
+    """歌词索引：歌词句子到下一句的映射、歌曲信息以及模糊匹配器
+
+    下一句和歌名存放在驻留表中，每个歌词索引键对应一个 array('I')，依次存放
+    (下一句 ID, 歌曲 ID, 出现次数)，避免为每个条目创建元组并重复保存相同的字符串。
+    副歌等重复段落在同一首歌中产生的相同条目只存一次，随机选择时按出现次数加权。
+    索引记录每首歌贡献的歌词索引键和每个文件的内容哈希，重新加载时只需重新解析
+    发生变化的文件，并增删对应歌曲的索引条目。
+
+    copy 得到的索引与原索引共享各歌词索引键的 array，修改某个 array 前才复制它，
+    更新单首歌曲的开销只与这首歌的歌词有关。
+    """
+
+    def __init__(self, preprocess: Optional[bool] = None):
+        self.preprocess = preprocess  # 建立索引时是否预处理歌词，None 表示尚未建立
+        self.postings: Dict[str, array] = {}  # 歌词句子 -> array('I', [下一句 ID, 歌曲 ID, 出现次数, ...])
+        self.keys = StringTable()  # 歌词句子的驻留表，引用计数为包含该句的歌曲数
+        self.sentences = StringTable()  # 下一句的驻留表
+        self.songs = StringTable()  # 歌名的驻留表
+        self.info: Dict[str, Dict[str, Any]] = {}  # 歌名 -> 歌曲信息
+        self.titles = TitleIndex()  # 歌名索引，与 info 同步维护
+        self.matcher = FuzzyMatcher()
+        self.song_keys: Dict[str, array] = {}  # 歌名 -> 该歌曲贡献的歌词索引键 ID
+        self.manifest: Dict[str, Tuple[int, int]] = {}  # 已索引文件的 {文件名: (文件大小, 修改时间)}
+        self.hashes: Dict[str, str] = {}  # 已索引文件的 {文件名: 内容哈希}
+        self.errors: List[Tuple[str, str]] = []  # 最近一次更新中加载失败的 (文件名, 错误信息)
+        # copy 得到的索引在最近一次更新中依次新增（True）、删除（False）的歌词索引键，其他索引为 None
+        self.key_changes: Optional[List[Tuple[str, bool]]] = None
+        self._owned: Optional[set] = None  # 可以原地修改的 postings 键，None 表示全部可以修改
+
+    @property
+    def entries(self) -> EntriesView:
+        """歌词句子 -> [(下一句, 歌名), ...]"""
+        return EntriesView(self)
+
+    def counts(self, key: str) -> List[Tuple[str, str, int]]:
+        """返回歌词句子对应的 [(下一句, 歌名, 出现次数), ...]"""
+        postings = self.postings[key]
+        sentences, songs = self.sentences.strings, self.songs.strings
+        return [(sentences[postings[i]], songs[postings[i + 1]], postings[i + 2])
+                for i in range(0, len(postings), 3)]
+
+    def lookup(self, key: str) -> List[Tuple[str, str]]:
+        """返回歌词句子对应的 [(下一句, 歌名), ...]，重复出现的条目按出现次数展开"""
+        entries = []
+        for next_sentence, song_name, count in self.counts(key):
+            entries.extend([(next_sentence, song_name)] * count)
+        return entries
+
+    def fanout(self, key: str) -> int:
+        """返回歌词句子对应的不同 (下一句, 歌名) 条目数"""
+        return len(self.postings[key]) // 3
+
+    def choose_next(self, key: str) -> Tuple[str, str]:
+        """从歌词句子对应的条目中按出现次数加权随机选择一条，返回 (下一句, 歌名)
+
+        每次出现被选中的概率相同，与在展开后的条目列表中均匀随机选择的分布一致。
+        """
+        postings = self.postings[key]
+        remaining = random.randrange(sum(postings[2::3]))
+        for i in range(0, len(postings), 3):
+            remaining -= postings[i + 2]
+            if remaining < 0:
+                return self.sentences[postings[i]], self.songs[postings[i + 1]]
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """序列化时把各歌词索引键的 array 拼接成一个 array，避免逐个序列化大量小对象"""
+        state = self.__dict__.copy()
+        postings = state.pop("postings")
+        state["posting_keys"] = list(postings)
+        state["posting_sizes"] = array('I', map(len, postings.values()))
+        data = array('I')
+        for key_postings in postings.values():
+            data.extend(key_postings)
+        state["posting_data"] = data
+        state["errors"] = []
+        state["key_changes"] = None
+        state["_owned"] = None
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]):
+        keys, sizes, data = state.pop("posting_keys"), state.pop("posting_sizes"), state.pop("posting_data")
+        self.__dict__.update(state)
+        self.postings = {}
+        position = 0
+        for key, size in zip(keys, sizes):
+            self.postings[key] = data[position:position + size]
+            position += size
+
+    def copy(self) -> "LyricsIndex":
+        """复制一份可独立修改的索引，修改副本不会影响正在使用的索引
+
+        各歌词索引键的 array 由两个索引共享，任一方修改前先复制（见 _writable_postings）。
+        复制只新建少量大容器、不会产生循环引用，期间暂停垃圾回收，避免中途触发的全量回收遍历整个索引。
+        """
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return self._copy()
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    def _copy(self) -> "LyricsIndex":
+        index = LyricsIndex(self.preprocess)
+        index.postings = dict(self.postings)
+        index._owned = set()
+        self._owned = set()
+        index.keys = self.keys.copy()
+        index.sentences = self.sentences.copy()
+        index.songs = self.songs.copy()
+        index.info = dict(self.info)
+        index.titles = self.titles.copy()
+        index.matcher = self.matcher.copy()
+        index.song_keys = dict(self.song_keys)  # 值只会整体替换，可以共享
+        index.manifest = dict(self.manifest)
+        index.hashes = dict(self.hashes)
+        index.key_changes = []
+        return index
+
+    def _writable_postings(self, key: str) -> array:
+        """返回可以原地修改的 array，与其他索引共享时先复制一份"""
+        postings = self.postings[key]
+        if self._owned is not None and key not in self._owned:
+            postings = self.postings[key] = postings[:]
+            self._owned.add(key)
+        return postings
+
+    def _set_postings(self, key: str, postings: array):
+        """放入新建的 array"""
+        self.postings[key] = postings
+        if self._owned is not None:
+            self._owned.add(key)
+
+    def add_song(self, song_name: str, total_lines: int, pairs: List[Tuple[str, str]]):
+        """将一首歌的解析结果加入索引"""
+        # 存储歌曲信息
+        self.info[song_name] = {
+            "total_lines": total_lines
+        }
+        self.titles.add(song_name)
+        key_ids = array('I')
+        count_positions = {}  # (歌词句子, 下一句) -> 该条目的出现次数在 postings 中的位置
+        for current_sentence, next_sentence in pairs:
+            position = count_positions.get((current_sentence, next_sentence))
+            if position is not None:
+                self.postings[current_sentence][position] += 1
+                continue
+            postings = self.postings.get(current_sentence)
+            if postings is None:
+                key_id = self.keys.acquire(current_sentence)
+                postings = array('I')
+                self._set_postings(self.keys[key_id], postings)
+                self.matcher.add(self.keys[key_id])
+                key_ids.append(key_id)
+                if self.key_changes is not None:
+                    self.key_changes.append((self.keys[key_id], True))
+            else:
+                if postings[-2] != self.songs.ids.get(song_name):
+                    # 该歌曲首次贡献这个歌词句子（同一首歌的条目总是追加在末尾）
+                    key_ids.append(self.keys.acquire(current_sentence))
+                postings = self._writable_postings(current_sentence)
+            postings.append(self.sentences.acquire(next_sentence))
+            postings.append(self.songs.acquire(song_name))
+            postings.append(1)
+            count_positions[(current_sentence, next_sentence)] = len(postings) - 1
+        self.song_keys[song_name] = key_ids
+
+    def remove_song(self, song_name: str):
+        """从索引中移除一首歌的所有条目"""
+        self.info.pop(song_name, None)
+        self.titles.remove(song_name)
+        song_id = self.songs.ids.get(song_name)
+        for key_id in self.song_keys.pop(song_name, ()):
+            key = self.keys[key_id]
+            postings = self.postings[key]
+            kept = array('I')
+            for i in range(0, len(postings), 3):
+                if postings[i + 1] == song_id:
+                    self.sentences.release(postings[i])
+                    self.songs.release(song_id)
+                else:
+                    kept.extend(postings[i:i + 3])
+            if kept:
+                self._set_postings(key, kept)
+            else:
+                del self.postings[key]
+                self.matcher.remove(key)
+                if self.key_changes is not None:
+                    self.key_changes.append((key, False))
+            self.keys.release(key_id)
+
+    def update(self, lyrics_dir: str, manifest: Dict[str, Tuple[int, int]], workers: int = 1) -> int:
+        """按新的文件清单更新索引，只重新解析新增或修改过的文件，返回重新解析的文件数
+
+        workers 大于 1 且待解析的文件足够多时，在进程池中分块并行解析，再按清单顺序合并。
+        """
+        self.errors = []
+        if self.key_changes is not None:
+            self.key_changes = []
+        reparsed = 0
+        # 移除已删除的文件
+        for filename in list(self.manifest):
+            if filename not in manifest:
+                self.remove_song(os.path.splitext(filename)[0])
+                del self.manifest[filename]
+                del self.hashes[filename]
+
+        pending = [(filename, self.hashes.get(filename)) for filename, file_stat in manifest.items()
+                   if self.manifest.get(filename) != file_stat]
+        if workers > 1 and len(pending) >= PARALLEL_PARSE_MIN_FILES:
+            results = _parse_files_parallel(lyrics_dir, self.preprocess, pending, workers)
+        else:
+            results = _parse_files(lyrics_dir, self.preprocess, pending)
+
+        for filename, content_hash, parsed, error in results:
+            song_name = os.path.splitext(filename)[0]
+            if error is not None:
+                # 解析失败的文件不记入清单，下次加载时重试
+                self.errors.append((filename, error))
+                if filename in self.manifest:
+                    self.remove_song(song_name)
+                    del self.manifest[filename]
+                    del self.hashes[filename]
+                continue
+            # 只有修改时间变化而内容未变时，parsed 为 None，无需替换
+            if parsed is not None:
+                total_lines, pairs = parsed
+                reparsed += 1
+                self.remove_song(song_name)
+                self.add_song(song_name, total_lines, pairs)
+                self.hashes[filename] = content_hash
+            self.manifest[filename] = manifest[filename]
+        return reparsed
+
+    @classmethod
+    def build(cls, lyrics_dir: str, preprocess: bool,
+              manifest: Optional[Dict[str, Tuple[int, int]]] = None, workers: int = 1) -> "LyricsIndex":
+        """读取歌词目录下的所有歌词文件并建立索引"""
+        index = cls(preprocess)
+        index.update(lyrics_dir, scan_lyrics_dir(lyrics_dir) if manifest is None else manifest, workers)
+        return index
+
+
+def save_snapshot(index: LyricsIndex, snapshot_path: str):
+    """将索引保存为快照文件（索引和匹配器以扁平数组和字符串列表序列化，见各自的 __getstate__）"""
+    header = {
+        "version": SNAPSHOT_VERSION,
+        "preprocess": index.preprocess,
+    }
+    # 先写临时文件再替换，避免中途失败留下损坏的快照
+    tmp_path = snapshot_path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, snapshot_path)
+
+
+def load_snapshot(snapshot_path: str, preprocess: bool) -> Optional[LyricsIndex]:
+    """读取快照文件；若快照不存在、版本不符或建立索引时的配置不同，返回 None
+
+    快照中记录了建立索引时的文件清单，读取后再用 LyricsIndex.update 补上之后的文件变化。
+    """
+    if not os.path.exists(snapshot_path):
+        return None
+    with open(snapshot_path, 'rb') as f:
+        header = pickle.load(f)
+        if (not isinstance(header, dict) or header.get("version") != SNAPSHOT_VERSION or
+                header.get("preprocess") != preprocess):
+            return None
+        index = pickle.load(f)
+    index.errors = []
+    index.matcher.reset_stats()
+    return index
@@ -0,0 +1,404 @@
+import asyncio
+import bisect
+import functools
+import math
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from difflib import SequenceMatcher
+from itertools import accumulate, chain
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+def _bigram_counts(text: str) -> Dict[str, int]:
+    """统计文本中每个字符二元组出现的次数"""
+    counts = {}
+    for i in range(len(text) - 1):
+        gram = text[i:i + 2]
+        counts[gram] = counts.get(gram, 0) + 1
+    return counts
+
+
+@functools.lru_cache(maxsize=4096)
+def _min_matches(total_length: int, threshold: float) -> int:
+    """返回相似度达到阈值所需的最少匹配字符数（与 SequenceMatcher.ratio 的计算方式一致）"""
+    if total_length == 0:
+        return 0
+    need = max(0, int(threshold * total_length / 2) - 1)
+    while 2.0 * need / total_length < threshold:
+        need += 1
+    return need
+
+
+def _gram_code(gram: str) -> int:
+    """把二元组编码为整数（Unicode 码位不超过 21 位）"""
+    return ord(gram[0]) << 21 | ord(gram[1])
+
+
+class PackedPostings:
+    """只读的二元组倒排表：各二元组的 (键 ID, 出现次数) 依次存放在两个 array 中，查询时再展开
+
+    从快照恢复匹配器时使用。二元组编码为整数后升序存放、二分查找，读取快照时只需恢复几个 array，
+    无需为每个二元组创建字符串和字典。
+    """
+
+    def __init__(self, codes: array, sizes: array, key_ids: array, counts: array):
+        self.codes = codes  # 序号 -> 二元组编码，升序
+        self.sizes = sizes  # 序号 -> 包含该二元组的歌词键数
+        self.offsets = array('I', [0])  # 序号 -> 该二元组在 key_ids、counts 中的起始位置，末尾为总长度
+        self.offsets.extend(accumulate(sizes))
+        self.key_ids = key_ids
+        self.counts = counts
+
+    def __contains__(self, gram: str) -> bool:
+        return self._slot(_gram_code(gram)) is not None
+
+    def _slot(self, code: int) -> Optional[int]:
+        slot = bisect.bisect_left(self.codes, code)
+        return slot if slot < len(self.codes) and self.codes[slot] == code else None
+
+    def items(self, slot: int) -> Tuple[array, array]:
+        """返回序号对应的 (键 ID, 出现次数) 两个 array"""
+        start, end = self.offsets[slot], self.offsets[slot + 1]
+        return self.key_ids[start:end], self.counts[start:end]
+
+    def get(self, gram: str) -> Optional[Dict[int, int]]:
+        """返回二元组的 {键 ID: 出现次数}（新字典），不存在时返回 None"""
+        slot = self._slot(_gram_code(gram))
+        if slot is None:
+            return None
+        return dict(zip(*self.items(slot)))
+
+
+class FuzzyMatcher:
+    """歌词模糊匹配器
+
+    为所有歌词索引键建立字符二元组倒排索引，并按长度分组。模糊匹配时依次经过
+    长度窗口、二元组计数、real_quick_ratio、quick_ratio 四道剪枝，只对剩下的候选
+    计算 SequenceMatcher 相似度，结果与逐条比较完全一致。
+
+    二元组剪枝依据：若两句的匹配字符数为 M、匹配块数为 k，则共享二元组数 S >= M - k；
+    而相邻匹配块之间至少隔着一个未匹配字符，故 k - 1 <= (la - M) + (lb - M)，
+    于是 S >= 3M - la - lb - 1。相似度达到阈值要求 M 不小于某个下界，由此得到
+    每个候选长度所需的最少共享二元组数。下界不大于 0 的长度无法剪枝，需全部比较。
+    """
+
+    # 各剪枝阶段的计数器名称，按执行顺序排列
+    STAGES = ("length_window", "bigram", "real_quick_ratio", "quick_ratio", "ratio", "accepted")
+
+    def __init__(self, keys: Iterable[str] = ()):
+        self._keys: List[Optional[str]] = []  # 键 ID -> 歌词键（已移除为 None），ID 顺序与歌词索引的插入顺序一致
+        self._ids: Dict[str, int] = {}  # 歌词键 -> 键 ID
+        self._postings: Dict[str, Dict[int, int]] = {}  # 二元组 -> {键 ID: 出现次数}，优先于 _packed 中的同一二元组
+        self._packed: Optional[PackedPostings] = None  # 从快照恢复后尚未修改过的二元组
+        # 可以原地修改的二元组和长度分组，None 表示全部可以修改；copy 后两个匹配器共享其余的字典和集合
+        self._owned_grams: Optional[Set[str]] = None
+        self._owned_lengths: Optional[Set[int]] = None
+        self._by_length: Dict[int, Set[int]] = {}  # 歌词键长度 -> {键 ID, ...}
+        self._lengths: List[int] = []  # 已出现的歌词键长度，升序
+        self.stats: Dict[str, int] = dict.fromkeys(self.STAGES, 0)  # 各阶段淘汰的候选数
+        for key in keys:
+            self.add(key)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, key: str):
+        """将一条歌词键加入倒排索引"""
+        key_id = len(self._keys)
+        self._keys.append(key)
+        self._ids[key] = key_id
+        length = len(key)
+        if length not in self._by_length:
+            self._by_length[length] = set()
+            if self._owned_lengths is not None:
+                self._owned_lengths.add(length)
+            bisect.insort(self._lengths, length)
+        self._writable_length(length).add(key_id)
+        for gram, count in _bigram_counts(key).items():
+            self._writable_postings(gram)[key_id] = count
+
+    def remove(self, key: str):
+        """从倒排索引中移除一条歌词键；再次加入时排在最后，与字典的插入顺序一致"""
+        key_id = self._ids.pop(key)
+        self._keys[key_id] = None
+        length = len(key)
+        self._writable_length(length).discard(key_id)
+        if not self._by_length[length]:
+            del self._by_length[length]
+            self._lengths.remove(length)
+        for gram in _bigram_counts(key):
+            postings = self._writable_postings(gram)
+            del postings[key_id]
+            # _packed 中仍有该二元组时保留空字典，遮盖其中的旧内容
+            if not postings and (self._packed is None or gram not in self._packed):
+                del self._postings[gram]
+
+    def _gram_postings(self, gram: str) -> Dict[int, int]:
+        """返回二元组的 {键 ID: 出现次数}，只能读取"""
+        postings = self._postings.get(gram)
+        if postings is None and self._packed is not None:
+            postings = self._packed.get(gram)
+        return postings or {}
+
+    def _writable_postings(self, gram: str) -> Dict[int, int]:
+        """返回二元组可修改的 {键 ID: 出现次数}，需要时从 _packed 展开，与其他匹配器共享时先复制"""
+        postings = self._postings.get(gram)
+        if postings is None:
+            postings = self._packed.get(gram) if self._packed is not None else None
+            postings = self._postings[gram] = postings or {}
+        elif self._owned_grams is not None and gram not in self._owned_grams:
+            postings = self._postings[gram] = dict(postings)
+        else:
+            return postings
+        if self._owned_grams is not None:
+            self._owned_grams.add(gram)
+        return postings
+
+    def _writable_length(self, length: int) -> Set[int]:
+        """返回可修改的长度分组，与其他匹配器共享时先复制"""
+        key_ids = self._by_length[length]
+        if self._owned_lengths is not None and length not in self._owned_lengths:
+            key_ids = self._by_length[length] = set(key_ids)
+            self._owned_lengths.add(length)
+        return key_ids
+
+    def copy(self) -> "FuzzyMatcher":
+        """复制一份可独立修改的匹配器
+
+        二元组倒排表和长度分组中的字典、集合由两个匹配器共享，任一方修改前先复制
+        （见 _writable_postings、_writable_length）。
+        """
+        matcher = FuzzyMatcher()
+        matcher._keys = list(self._keys)
+        matcher._ids = dict(self._ids)
+        matcher._postings = dict(self._postings)
+        matcher._packed = self._packed  # 只读，可以共享
+        matcher._by_length = dict(self._by_length)
+        matcher._lengths = list(self._lengths)
+        matcher._owned_grams, matcher._owned_lengths = set(), set()
+        self._owned_grams, self._owned_lengths = set(), set()
+        matcher.stats = dict(self.stats)
+        return matcher
+
+    def __getstate__(self):
+        """序列化（索引快照、传给工作进程）时把二元组倒排索引展开为扁平数组（见 PackedPostings），
+        避免逐个序列化大量小字典"""
+        packed = self._packed
+        if packed is None:
+            grams = sorted(gram for gram, postings in self._postings.items() if postings)
+            postings_list = [self._postings[gram] for gram in grams]
+            codes = array('Q', map(_gram_code, grams))  # 二元组的字符串顺序与编码顺序一致
+            sizes = array('I', map(len, postings_list))
+            key_ids = array('I', chain.from_iterable(postings_list))
+            counts = array('I', chain.from_iterable(postings.values() for postings in postings_list))
+        elif not self._postings:
+            codes, sizes, key_ids, counts = packed.codes, packed.sizes, packed.key_ids, packed.counts
+        else:
+            # 按编码顺序合并：_packed 中未修改的二元组整段复制，只逐个处理 _postings 中修改过的二元组
+            codes, sizes, key_ids, counts = array('Q'), array('I'), array('I'), array('I')
+            offsets = packed.offsets
+
+            def copy_slots(start, end):
+                codes.extend(packed.codes[start:end])
+                sizes.extend(packed.sizes[start:end])
+                key_ids.extend(packed.key_ids[offsets[start]:offsets[end]])
+                counts.extend(packed.counts[offsets[start]:offsets[end]])
+
+            next_slot = 0
+            for code, postings in sorted((_gram_code(gram), postings) for gram, postings in self._postings.items()):
+                slot = bisect.bisect_left(packed.codes, code)
+                copy_slots(next_slot, slot)
+                if slot < len(packed.codes) and packed.codes[slot] == code:
+                    slot += 1  # 被 _postings 中的内容取代
+                next_slot = slot
+                if postings:
+                    codes.append(code)
+                    sizes.append(len(postings))
+                    key_ids.extend(postings.keys())
+                    counts.extend(postings.values())
+            copy_slots(next_slot, len(packed.codes))
+        return {"keys": self._keys, "codes": codes, "sizes": sizes, "key_ids": key_ids, "counts": counts}
+
+    def __setstate__(self, state):
+        """恢复时二元组倒排索引保持扁平数组（PackedPostings），键 ID、长度分组由歌词键重新计算"""
+        self._keys = state["keys"]
+        self._ids = {key: key_id for key_id, key in enumerate(self._keys) if key is not None}
+        self._by_length = {}
+        for key, key_id in self._ids.items():
+            self._by_length.setdefault(len(key), set()).add(key_id)
+        self._lengths = sorted(self._by_length)
+        self._postings = {}
+        self._packed = PackedPostings(state["codes"], state["sizes"], state["key_ids"], state["counts"])
+        self._owned_grams = self._owned_lengths = None
+        self.stats = dict.fromkeys(self.STAGES, 0)
+
+    def reset_stats(self):
+        """清零各阶段计数器"""
+        self.stats = dict.fromkeys(self.STAGES, 0)
+
+    def _length_window(self, query_length: int, threshold: float) -> List[int]:
+        """返回相似度上界 2 * min(la, lb) / (la + lb) 仍可能达到阈值的候选长度"""
+        if threshold <= 0:
+            return self._lengths
+        if threshold > 1:
+            return []
+        # 先用浮点估算的窗口二分定位，再按 SequenceMatcher 的算法逐个精确判断
+        low = math.floor(threshold * query_length / (2 - threshold)) - 1
+        high = math.ceil(query_length * (2 - threshold) / threshold) + 1
+        start = bisect.bisect_left(self._lengths, low)
+        end = bisect.bisect_right(self._lengths, high)
+        return [length for length in self._lengths[start:end]
+                if _min_matches(query_length + length, threshold) <= min(query_length, length)]
+
+    def _candidates(self, query: str, threshold: float) -> List[int]:
+        """返回可能达到阈值的候选键 ID，按插入顺序排列"""
+        query_length = len(query)
+        required = {}  # 候选长度 -> 所需最少共享二元组数
+        candidates = set()
+        window_size = 0
+        for length in self._length_window(query_length, threshold):
+            key_ids = self._by_length[length]
+            window_size += len(key_ids)
+            need = _min_matches(query_length + length, threshold)
+            required[length] = 3 * need - query_length - length - 1
+            if required[length] <= 0:
+                candidates.update(key_ids)
+
+        if len(candidates) < window_size:
+            shared = {}
+            for gram, query_count in _bigram_counts(query).items():
+                for key_id, key_count in self._gram_postings(gram).items():
+                    shared[key_id] = shared.get(key_id, 0) + min(query_count, key_count)
+            for key_id, count in shared.items():
+                min_shared = required.get(len(self._keys[key_id]))
+                if min_shared is not None and count >= min_shared:
+                    candidates.add(key_id)
+
+        self.stats["length_window"] += len(self._ids) - window_size
+        self.stats["bigram"] += window_size - len(candidates)
+        return sorted(candidates)
+
+    def best_match(self, query: str, threshold: float) -> Optional[Tuple[str, float]]:
+        """查找与 query 最相似且相似度不低于阈值的歌词键，返回 (歌词键, 相似度)"""
+        best_match = None
+        best_similarity = 0.0
+        stats = self.stats
+
+        for key_id in self._candidates(query, threshold):
+            indexed_lyrics = self._keys[key_id]
+            matcher = SequenceMatcher(None, query, indexed_lyrics)
+            # 先用廉价的上界排除不可能胜出的候选：上界低于阈值，或不超过当前最佳相似度
+            upper_bound = matcher.real_quick_ratio()
+            if upper_bound < threshold or upper_bound <= best_similarity:
+                stats["real_quick_ratio"] += 1
+                continue
+            upper_bound = matcher.quick_ratio()
+            if upper_bound < threshold or upper_bound <= best_similarity:
+                stats["quick_ratio"] += 1
+                continue
+            # 计算相似度
+            similarity = matcher.ratio()
+            if similarity > best_similarity and similarity >= threshold:
+                if best_match is not None:
+                    stats["ratio"] += 1  # 之前的最佳候选被取代
+                best_similarity = similarity
+                best_match = indexed_lyrics
+            else:
+                stats["ratio"] += 1
+
+        if best_match is None:
+            return None
+        stats["accepted"] += 1
+        return best_match, best_similarity
+
+
+# 工作进程内持有的匹配器副本，以及已经应用的歌词键增删数
+_worker_matcher: Optional[FuzzyMatcher] = None
+_worker_applied = 0
+
+
+def _init_worker(matcher: FuzzyMatcher):
+    """工作进程初始化：保存主进程传入的匹配器"""
+    global _worker_matcher, _worker_applied
+    _worker_matcher = matcher
+    _worker_applied = 0
+
+
+def _match_in_worker(query: str, threshold: float,
+                     changes: Tuple[Tuple[str, bool], ...]) -> Tuple[Optional[Tuple[str, float]], Dict[str, int]]:
+    """在工作进程中执行模糊匹配，同时返回本次匹配的剪枝计数
+
+    changes 为进程池建立以来歌词键的全部增删，先按顺序应用本进程还没有应用的部分。
+    """
+    global _worker_applied
+    for key, is_added in changes[_worker_applied:]:
+        if is_added:
+            _worker_matcher.add(key)
+        else:
+            _worker_matcher.remove(key)
+    _worker_applied = len(changes)
+    _worker_matcher.reset_stats()
+    result = _worker_matcher.best_match(query, threshold)
+    return result, _worker_matcher.stats
+
+
+class MatcherProcessPool:
+    """在进程池中执行模糊匹配，避免 CPU 密集的相似度计算阻塞事件循环
+
+    每个工作进程持有一份匹配器副本。歌词索引增量更新后，refresh 只记录歌词键的增删，随之后的
+    匹配任务发给工作进程补上，不重建进程池；累计的增删过多或索引整体重建时，才用新的匹配器
+    重建进程池，旧进程池在完成已提交的任务后自行退出。
+    """
+
+    # 进程池建立以来累计的歌词键增删超过该数量时重建进程池，避免每个匹配任务附带的增删过长
+    MAX_PENDING_CHANGES = 500
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._matcher: Optional[FuzzyMatcher] = None  # 当前的匹配器，进程池未启动时直接用它匹配
+        self._changes: Tuple[Tuple[str, bool], ...] = ()  # 进程池建立以来歌词键的增删
+
+    def refresh(self, matcher: FuzzyMatcher, key_changes: Optional[List[Tuple[str, bool]]] = None):
+        """换用新的匹配器
+
+        key_changes 为新匹配器相对上一个匹配器的歌词键增删（LyricsIndex.key_changes），
+        为 None 或累计的增删过多时重建进程池。
+        """
+        self._matcher = matcher
+        if (self._executor is not None and key_changes is not None and
+                len(self._changes) + len(key_changes) <= self.MAX_PENDING_CHANGES):
+            # 每次生成新的元组，已提交任务引用的增删不受影响
+            self._changes += tuple(key_changes)
+            return
+        old_executor = self._executor
+        self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                             initializer=_init_worker, initargs=(matcher,))
+        self._changes = ()
+        if old_executor is not None:
+            old_executor.shutdown(wait=False)
+
+    async def best_match(self, query: str, threshold: float,
+                         stats: Dict[str, int]) -> Optional[Tuple[str, float]]:
+        """在进程池中查找最相似的歌词键，并把剪枝计数累加到 stats；进程池未启动时在本进程中匹配"""
+        if self._executor is None:
+            if self._matcher is None:
+                return None
+            before = dict(self._matcher.stats)
+            result = self._matcher.best_match(query, threshold)
+            if stats is not self._matcher.stats:
+                for stage, count in self._matcher.stats.items():
+                    stats[stage] += count - before[stage]
+            return result
+        loop = asyncio.get_running_loop()
+        result, worker_stats = await loop.run_in_executor(
+            self._executor, _match_in_worker, query, threshold, self._changes)
+        for stage, count in worker_stats.items():
+            stats[stage] += count
+        return result
+
+    def shutdown(self):
+        """关闭进程池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
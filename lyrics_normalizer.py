@@ -0,0 +1,46 @@
+import re
+
+# QQ 表情格式 [表情:数字] 与其他方括号格式，需按原顺序分两步去除
+_QQ_FACE_PATTERN = re.compile(r'\[表情:\d+\]')
+_BRACKET_PATTERN = re.compile(r'\[[^\]]*\]')
+
+
+def _is_kept(char: str) -> bool:
+    """判断字符是否保留：字母、数字、中文字符、日文假名和空白字符"""
+    return ('a' <= char <= 'z' or 'A' <= char <= 'Z' or '0' <= char <= '9' or
+            '\u4e00' <= char <= '\u9fff' or  # 中文字符
+            '\u3040' <= char <= '\u30ff' or  # 日文平假名和片假名
+            '\uff66' <= char <= '\uff9f' or  # 日文半角片假名
+            char.isspace())
+
+
+class _TranslateTable(dict):
+    """str.translate 使用的字符映射表，遇到新字符时计算并缓存其映射
+
+    保留的字符中只有英文字母有大小写之分，因此删除字符与转小写可以合并在一次 translate 中完成。
+    emoji 均不在保留范围内，无需单独处理。
+    """
+
+    def __missing__(self, ordinal: int):
+        char = chr(ordinal)
+        value = (ord(char.lower()) if 'A' <= char <= 'Z' else ordinal) if _is_kept(char) else None
+        self[ordinal] = value
+        return value
+
+
+_TRANSLATE_TABLE = _TranslateTable()
+
+
+def normalize_lyrics(lyrics: str) -> str:
+    """预处理歌词，去除标点符号、emoji、QQ 表情等，统一大小写等
+
+    结果与逐步执行正则替换的旧实现完全一致，但模式和映射表只构建一次。
+    """
+    # 去除 QQ 表情格式 [表情:数字] 及其他方括号格式
+    if '[' in lyrics:
+        lyrics = _QQ_FACE_PATTERN.sub('', lyrics)
+        lyrics = _BRACKET_PATTERN.sub('', lyrics)
+    # 去除标点符号和 emoji，同时转为小写
+    processed = lyrics.translate(_TRANSLATE_TABLE)
+    # 去除多余空格
+    return ' '.join(processed.split())
@@ -0,0 +1,157 @@
+import asyncio
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+# inotify 事件掩码，见 <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+_WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+class _Inotify:
+    """通过 ctypes 调用 libc 的 inotify 接口监听单个目录"""
+
+    def __init__(self, path: str):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        if libc.inotify_add_watch(self.fd, os.fsencode(path), _WATCH_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, "inotify_add_watch 失败")
+
+    def read_names(self) -> Tuple[bool, list]:
+        """读出所有待处理事件，返回 (是否发生队列溢出, 涉及的文件名列表)"""
+        overflow = False
+        names = []
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                _, mask, _, name_length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + name_length].rstrip(b"\0")
+                offset += name_length
+                if mask & IN_Q_OVERFLOW:
+                    overflow = True
+                elif name:
+                    names.append(os.fsdecode(name))
+        return overflow, names
+
+    def close(self):
+        os.close(self.fd)
+
+
+class LyricsWatcher:
+    """监听歌词目录的变化，将短时间内的多次变化合并为一次回调
+
+    Linux 上优先使用 inotify，不可用时退回到定期扫描文件大小和修改时间。
+    每次检测到变化后等待 debounce 秒，期间若有新的变化则重新计时；持续变化时最多等待
+    max_delay 秒，保证批量导入期间也能及时更新。
+    """
+
+    def __init__(self, lyrics_dir: str, on_change: Callable[[], Awaitable[None]],
+                 debounce: float = 2.0, poll_interval: float = 5.0, max_delay: Optional[float] = None):
+        self.lyrics_dir = lyrics_dir
+        self.on_change = on_change
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.max_delay = max_delay if max_delay is not None else debounce * 10
+        self.mode = None  # "inotify" 或 "polling"
+        self._inotify: Optional[_Inotify] = None
+        self._poll_task: Optional[asyncio.Task] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+        self._last_manifest: Dict[str, Tuple[int, int]] = {}
+
+    def start(self):
+        """开始监听"""
+        loop = asyncio.get_running_loop()
+        if sys.platform.startswith("linux"):
+            try:
+                self._inotify = _Inotify(self.lyrics_dir)
+                loop.add_reader(self._inotify.fd, self._on_inotify_readable)
+                self.mode = "inotify"
+            except Exception:
+                self._inotify = None
+        if self._inotify is None:
+            self._last_manifest = self._scan()
+            self._poll_task = loop.create_task(self._poll_loop())
+            self.mode = "polling"
+        self._flush_task = loop.create_task(self._flush_loop())
+
+    async def stop(self):
+        """停止监听"""
+        if self._inotify is not None:
+            asyncio.get_running_loop().remove_reader(self._inotify.fd)
+            self._inotify.close()
+            self._inotify = None
+        for task in (self._poll_task, self._flush_task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._poll_task = self._flush_task = None
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        """扫描歌词目录中 .txt 文件的大小和修改时间"""
+        manifest = {}
+        try:
+            with os.scandir(self.lyrics_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".txt"):
+                        stat = entry.stat()
+                        manifest[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            pass
+        return manifest
+
+    def _on_inotify_readable(self):
+        overflow, names = self._inotify.read_names()
+        if overflow or any(name.endswith(".txt") for name in names):
+            self._changed.set()
+
+    async def _poll_loop(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            manifest = await asyncio.get_running_loop().run_in_executor(None, self._scan)
+            if manifest != self._last_manifest:
+                self._last_manifest = manifest
+                self._changed.set()
+
+    async def _flush_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._changed.wait()
+            first_change = loop.time()
+            # 等到目录安静 debounce 秒，或距第一次变化已达 max_delay 秒
+            while True:
+                self._changed.clear()
+                remaining = min(self.debounce, first_change + self.max_delay - loop.time())
+                if remaining <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(self._changed.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self.on_change()
+            except Exception:
+                pass  # 回调自行记录错误，监听不应因此中断
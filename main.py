@@ -1,14 +1,31 @@
+import asyncio
 import os
-import random
-import re
 import shutil
-from difflib import SequenceMatcher
-from typing import Tuple, Optional
+import sys
+from typing import List, Tuple, Optional
 
 from astrbot.api import logger, AstrBotConfig
 from astrbot.api.event import filter, AstrMessageEvent
 from astrbot.api.star import Context, Star, StarTools, register
 
+from .lookup_cache import LookupCache, MISSING
+from .lyrics_gate import MatchGate
+from .lyrics_index import LyricsIndex, load_snapshot, read_lyrics_preview, save_snapshot, scan_lyrics_dir
+from .lyrics_matcher import MatcherProcessPool
+from .lyrics_normalizer import normalize_lyrics
+from .lyrics_watcher import LyricsWatcher
+from .search_queue import SearchQueue
+
+# tools 目录下的脚本之间以模块名互相导入，插件使用其中的模块前需将该目录加入 sys.path
+TOOLS_DIR = os.path.join(os.path.dirname(__file__), "tools")
+
+# /lyrics view 最多显示的字符数
+VIEW_MAX_CHARS = 2000
+# /lyrics view 缓存的歌曲数和有效期（秒）
+VIEW_CACHE_SIZE = 32
+VIEW_CACHE_TTL = 600
+# 索引更新后等待的秒数，期间没有新的更新才保存快照，期间再次更新时重新计时
+SNAPSHOT_DELAY = 30
 
 @register("singalong", "EEEpai", "发送一句歌词，机器人会回复下一句", "1.3.0")
 class SingAlongPlugin(Star):
@@ -22,8 +39,29 @@ class SingAlongPlugin(Star):
         self.data_dir = StarTools.get_data_dir("singalong")
         self.lyrics_dir = os.path.join(self.data_dir, "lyrics")
         
-        self.lyrics_index = {}  # 歌词句子 -> [(下一句, 歌名), ...]
-        self.lyrics_info = {}  # 歌名 -> 歌曲信息(作者等)
+        self.snapshot_path = os.path.join(self.data_dir, "lyrics_index.snapshot")  # 歌词索引快照
+        self.provider_stats_path = os.path.join(self.data_dir, "provider_stats.json")  # 歌词平台统计
+
+        self.index = LyricsIndex()  # 歌词索引，包含句子索引、歌曲信息和模糊匹配器
+        self.match_gate = None  # 模糊匹配前的预筛，随索引一起更新
+        self.provider_client = None  # 歌词平台的 HTTP 客户端，在 initialize 中创建
+        self.provider_stats = None  # 歌词平台的耗时、命中率统计与熔断器，在 initialize 中读取
+        self.search_queue = None  # /lyrics search 的任务队列，在 initialize 中启动
+        self.match_pool = None  # 模糊匹配进程池，未启用时在事件循环中直接匹配
+        self.index_version = 0  # 歌词索引版本，每次重建后递增
+        self.watcher = None  # 歌词目录监听器，未启用时为 None
+        self.index_ready = False  # 首次加载歌词是否已完成
+        self.initial_load_task = None  # 首次加载歌词的后台任务
+        self._load_lock = asyncio.Lock()  # 保证同一时间只有一次索引更新
+        self._snapshot_lock = asyncio.Lock()  # 保证同一时间只有一次快照写入
+        self._snapshot_dirty = False  # 当前索引是否尚未保存为快照
+        self._snapshot_task = None  # 等待保存快照的后台任务
+        self._sorted_titles: Tuple[int, List[str]] = (-1, [])  # (索引版本, 排序后的歌名列表)，供 /lyrics list 分页
+        # 消息 -> 匹配到的歌词索引键（含无匹配结果）的缓存
+        self.lookup_cache = LookupCache(self.config.get("lookup_cache_size", 1024),
+                                        self.config.get("lookup_cache_ttl", 600))
+        # 歌名 -> (文件大小和修改时间, /lyrics view 的显示内容)，文件未变化时无需重新读取
+        self.view_cache = LookupCache(VIEW_CACHE_SIZE, VIEW_CACHE_TTL)
 
         # 确保用户歌词目录存在 - 这是主要的歌词加载目录
         os.makedirs(self.lyrics_dir, exist_ok=True)
@@ -34,6 +72,21 @@ class SingAlongPlugin(Star):
             os.makedirs(self.default_lyrics_dir, exist_ok=True)
             logger.info(f"创建默认歌词目录: {self.default_lyrics_dir}")
 
+    @property
+    def lyrics_index(self):
+        """歌词句子 -> [(下一句, 歌名), ...]"""
+        return self.index.entries
+
+    @property
+    def lyrics_info(self):
+        """歌名 -> 歌曲信息(作者等)"""
+        return self.index.info
+
+    @property
+    def fuzzy_matcher(self):
+        """歌词句子的二元组倒排索引，用于模糊匹配"""
+        return self.index.matcher
+
     async def _migrate_default_lyrics(self):
         """将插件内默认歌词文件夹的内容增量迁移到用户的持久化数据目录"""
         try:
@@ -82,13 +135,6 @@ class SingAlongPlugin(Star):
         except Exception as e:
             logger.error(f"迁移插件内默认歌词文件时发生错误: {str(e)}")
 
-    def _contains_chinese(self, text: str) -> bool:
-        """检测文本是否包含汉字"""
-        for char in text:
-            if '\u4e00' <= char <= '\u9fff':
-                return True
-        return False
-
     async def _migrate_lyrics_if_enabled(self):
         """根据配置决定是否迁移默认歌词到用户目录"""
         if self.config.get("auto_import_default_lyrics", True):
@@ -100,14 +146,66 @@ class SingAlongPlugin(Star):
     async def initialize(self):
         """插件初始化，加载所有歌词文件并建立索引"""
         logger.info("正在初始化 SingAlong 插件...")
+
+        # 创建歌词平台的 HTTP 客户端，搜索歌词时复用连接，插件终止时关闭
+        if TOOLS_DIR not in sys.path:
+            sys.path.append(TOOLS_DIR)
+        from provider_client import AsyncProviderClient
+        from provider_stats import ProviderStats
+        from response_cache import ResponseCache
+        # 缓存平台响应，重复搜索同一首歌时不再请求平台；离线模式下只从缓存读取
+        cache = ResponseCache(os.path.join(self.data_dir, "provider_cache"),
+                              max_bytes=self.config.get("provider_cache_mb", 64) * 1024 * 1024,
+                              offline=self.config.get("provider_offline", False))
+        self.provider_client = AsyncProviderClient(read_timeout=self.config.get("provider_timeout", 10),
+                                                   max_retries=self.config.get("provider_max_retries", 2),
+                                                   cache=cache)
+        # 读取上次保存的平台统计，搜索时据此排定平台优先级并跳过连续出错的平台
+        self.provider_stats = ProviderStats.load(
+            self.provider_stats_path,
+            failure_threshold=self.config.get("provider_breaker_failures", 3),
+            cooldown=self.config.get("provider_breaker_cooldown", 120))
+
+        # 启动搜索任务队列，限制同时进行的搜索数和排队数
+        self.search_queue = SearchQueue(self.config.get("search_workers", 2), self.config.get("search_queue_size", 8))
+        self.search_queue.start()
+
+        # 根据配置决定是否在进程池中执行模糊匹配
+        match_workers = self.config.get("fuzzy_match_workers", 0)
+        if match_workers > 0:
+            self.match_pool = MatcherProcessPool(match_workers)
+            logger.info(f"模糊匹配将在 {match_workers} 个工作进程中执行")
         
         # 根据配置决定是否迁移默认歌词到用户目录
         await self._migrate_lyrics_if_enabled()
         
-        # 然后加载歌词
-        await self._load_lyrics()
-        logger.info(
-            f"SingAlong 插件初始化完成，已加载 {len(self.lyrics_info)} 首歌曲，{len(self.lyrics_index)} 条歌词索引")
+        # 然后在后台加载歌词，加载完成前 on_message 不处理消息
+        self.initial_load_task = asyncio.create_task(self._initial_load())
+
+        # 根据配置决定是否监听歌词目录，自动更新索引
+        if self.config.get("watch_lyrics_dir", False):
+            self.watcher = LyricsWatcher(self.lyrics_dir, self._on_lyrics_dir_changed,
+                                         debounce=self.config.get("watch_debounce_seconds", 2.0))
+            self.watcher.start()
+            logger.info(f"已开始监听歌词目录（{self.watcher.mode}）")
+
+    async def _initial_load(self):
+        """首次加载歌词并建立索引"""
+        try:
+            await self._load_lyrics()
+            logger.info(
+                f"SingAlong 插件初始化完成，已加载 {len(self.lyrics_info)} 首歌曲，{len(self.lyrics_index)} 条歌词索引")
+        except Exception as e:
+            logger.error(f"加载歌词库失败: {str(e)}")
+
+    async def _on_lyrics_dir_changed(self):
+        """歌词目录发生变化（已合并短时间内的多次变化）时增量更新索引"""
+        try:
+            reparsed = await self._load_lyrics()
+            logger.info(f"检测到歌词目录变化，已更新歌词索引，重新解析了 {reparsed} 个歌词文件，"
+                        f"共 {len(self.lyrics_info)} 首歌曲")
+        except Exception as e:
+            logger.error(f"自动更新歌词索引失败: {str(e)}")
 
     def _find_song_by_name(self, song_name: str) -> Tuple[int, str]:
         """根据歌曲名查找目录中的歌曲，返回 (匹配状态, 歌曲路径)
@@ -115,164 +213,184 @@ class SingAlongPlugin(Star):
         """
         # 查找匹配的歌曲
         song_name = song_name.strip()
-        exact_matches = []
-        fuzzy_matches = []
-
-        # 首先尝试精确匹配
-        for existing_song in self.lyrics_info.keys():
-            if song_name.lower() == existing_song.lower():
-                exact_matches.append(existing_song)
-
-        # 如果有精确匹配，使用精确匹配结果
-        if exact_matches:
-            return 0, exact_matches[0]
-        # 没有精确匹配，进行模糊匹配
-        else:
-            for existing_song in self.lyrics_info.keys():
-                if song_name.lower() in existing_song.lower():
-                    fuzzy_matches.append(existing_song)
+        titles = self.index.titles
 
-            if not fuzzy_matches:
-                return 2, ""
+        # 首先尝试精确匹配（忽略大小写）
+        exact_match = titles.find_exact(song_name)
+        if exact_match is not None:
+            return 0, exact_match
 
-            if len(fuzzy_matches) > 1:
-                # 多个模糊匹配结果，让用户选择
-                song_list = "\n".join([f"  {song}" for song in fuzzy_matches])
-                return 1, song_list
+        # 没有精确匹配，查找包含该名称的歌曲
+        fuzzy_matches = titles.find_containing(song_name)
+        if not fuzzy_matches:
+            return 2, ""
 
-            # 唯一模糊匹配
-            return 0, fuzzy_matches[0]
+        if len(fuzzy_matches) > 1:
+            # 多个模糊匹配结果，让用户选择
+            song_list = "\n".join([f"  {song}" for song in fuzzy_matches])
+            return 1, song_list
 
-    async def _load_lyrics(self):
-        """加载所有歌词文件并建立索引"""
-        self.lyrics_index = {}
-        self.lyrics_info = {}
+        # 唯一模糊匹配
+        return 0, fuzzy_matches[0]
 
-        # 获取歌词目录下的所有文件
-        try:
-            for filename in os.listdir(self.lyrics_dir):
-                if filename.endswith(".txt"):
-                    song_name = os.path.splitext(filename)[0]
-                    file_path = os.path.join(self.lyrics_dir, filename)
-
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            lines = [line.strip() for line in f.readlines() if line.strip()]
-
-                            # 存储歌曲信息
-                            self.lyrics_info[song_name] = {
-                                "total_lines": len(lines)
-                            }
-
-                            # 建立歌词索引
-                            # 首先将所有行拆分成句子（如果一行内有空格分隔的多句）
-                            sentences = []
-                            for line in lines:
-                                # 先过滤掉明显的信息行和标题行
-                                if (':' in line or '：' in line or  # 包含冒号的信息行
-                                        ' - ' in line or  # 包含连字符的标题行（歌曲-歌手）
-                                        '(' in line and ')' in line):  # 包含括号的标题行
-                                    continue
-                                # 检测行内是否有空格分隔的多句歌词
-                                if ' ' in line.strip():
-                                    # 只有包含汉字的歌词才进行空格拆分，英文歌不拆分
-                                    if self._contains_chinese(line):
-                                        # 将一行拆分成多句
-                                        parts = [part.strip() for part in line.split(' ') if part.strip()]
-                                        sentences.extend(parts)
-                                    else:
-                                        sentences.append(line.strip())
-                                else:
-                                    sentences.append(line.strip())
-                            # 过滤掉空句子和无效句子
-                            filtered_sentences = []
-                            for sentence in sentences:
-                                if (sentence and
-                                        len(sentence) > 1 and  # 过滤单字符
-                                        not sentence.isdigit() and  # 过滤纯数字
-                                        not all(c in '()[]{}' for c in sentence)):  # 过滤纯括号
-                                    filtered_sentences.append(sentence)
-
-                            # 建立句子到下一句的索引
-                            for i in range(len(filtered_sentences) - 1):
-                                current_sentence = self._preprocess_lyrics(filtered_sentences[i]) if self.config[
-                                    "preprocess_lyrics"] else filtered_sentences[i]
-                                next_sentence = filtered_sentences[i + 1]
-
-                                if not current_sentence.strip():
-                                    continue
-
-                                if current_sentence not in self.lyrics_index:
-                                    self.lyrics_index[current_sentence] = []
-
-                                self.lyrics_index[current_sentence].append((next_sentence, song_name))
-                    except Exception as e:
-                        logger.error(f"加载歌词文件 {filename} 失败: {str(e)}")
-        except Exception as e:
-            logger.error(f"遍历歌词目录失败: {str(e)}")
+    async def _load_lyrics(self, filenames: Optional[List[str]] = None) -> int:
+        """加载歌词文件并更新索引，只重新解析新增或修改过的文件，返回重新解析的文件数
+
+        filenames 为空时扫描整个歌词目录；否则只检查指定的文件（用于添加或删除单首歌曲）。
+        新索引在工作线程中建立，完成后一次性替换当前索引，替换前旧索引继续提供服务。
+        """
+        async with self._load_lock:
+            preprocess = self.config["preprocess_lyrics"]
+            current_index = self.index
+            loop = asyncio.get_running_loop()
+            index, reparsed, snapshot_stale = await loop.run_in_executor(
+                None, self._build_index, current_index, preprocess, filenames)
+
+            if index is not current_index:
+                match_gate = await loop.run_in_executor(None, self._update_match_gate, index)
+                if self.match_gate is not None:
+                    # 预筛统计跨索引重建累计
+                    match_gate.checked, match_gate.rejected = self.match_gate.checked, self.match_gate.rejected
+                self.index, self.match_gate = index, match_gate  # 原子替换
+                # 让工作进程换用新的匹配器
+                if self.match_pool:
+                    self.match_pool.refresh(self.fuzzy_matcher, index.key_changes)
+                # 索引版本变化后，查找缓存中的旧结果全部失效
+                self.index_version += 1
+            if snapshot_stale:
+                self._schedule_snapshot()
+            self.index_ready = True
+            return reparsed
+
+    def _update_match_gate(self, index: LyricsIndex) -> MatchGate:
+        """在工作线程中得到新索引的预筛：增量更新时在当前预筛的副本上加入新增的歌词键，否则重新建立"""
+        if index.key_changes is not None and self.match_gate is not None:
+            match_gate = self.match_gate.updated(index.key_changes)
+            if match_gate is not None:
+                return match_gate
+        return MatchGate(index.entries)
+
+    def _schedule_snapshot(self):
+        """SNAPSHOT_DELAY 秒内没有新的索引更新时再保存快照，连续添加、删除歌曲时只序列化一次索引"""
+        self._snapshot_dirty = True
+        if self._snapshot_task is not None:
+            self._snapshot_task.cancel()
+        self._snapshot_task = asyncio.create_task(self._save_snapshot_later())
+
+    async def _save_snapshot_later(self):
+        await asyncio.sleep(SNAPSHOT_DELAY)
+        # 开始写入后不再被新的更新取消，避免两次写入同时进行
+        self._snapshot_task = None
+        await self._save_snapshot()
+
+    async def _save_snapshot(self):
+        """在工作线程中将当前索引保存为快照（已保存过时跳过）"""
+        async with self._snapshot_lock:
+            if not self._snapshot_dirty:
+                return
+            self._snapshot_dirty = False
+            try:
+                # 已替换上线的索引不会再被修改，可以在工作线程中序列化
+                await asyncio.get_running_loop().run_in_executor(None, save_snapshot, self.index, self.snapshot_path)
+            except Exception as e:
+                self._snapshot_dirty = True
+                logger.error(f"保存歌词索引快照失败: {str(e)}")
+
+    def _build_index(self, current_index: LyricsIndex, preprocess: bool,
+                     filenames: Optional[List[str]]) -> Tuple[LyricsIndex, int, bool]:
+        """在工作线程中建立新索引，返回 (新索引, 重新解析的文件数, 快照是否需要更新)；没有变化时返回当前索引"""
+        if filenames is None:
+            # 获取歌词目录下的所有文件
+            try:
+                manifest = scan_lyrics_dir(self.lyrics_dir)
+            except Exception as e:
+                logger.error(f"遍历歌词目录失败: {str(e)}")
+                manifest = {}
+        else:
+            manifest = dict(current_index.manifest)
+            for filename in filenames:
+                file_path = os.path.join(self.lyrics_dir, filename)
+                if os.path.exists(file_path):
+                    stat = os.stat(file_path)
+                    manifest[filename] = (stat.st_size, stat.st_mtime_ns)
+                else:
+                    manifest.pop(filename, None)
+
+        snapshot_stale = False
+        if current_index.preprocess != preprocess:
+            # 首次加载或预处理配置变化：读取快照，没有可用快照时从空索引开始
+            index = None
+            try:
+                index = load_snapshot(self.snapshot_path, preprocess)
+            except Exception as e:
+                logger.warning(f"读取歌词索引快照失败，将重新建立索引: {str(e)}")
+            if index is not None:
+                logger.info(f"已从快照加载歌词索引，共 {len(index.info)} 首歌曲")
+            else:
+                index = LyricsIndex(preprocess)
+                snapshot_stale = True
+        elif manifest == current_index.manifest:
+            return current_index, 0, False
+        else:
+            # 在副本上更新，当前索引在替换前继续提供服务
+            index = current_index.copy()
+
+        old_manifest = dict(index.manifest)
+        reparsed = index.update(self.lyrics_dir, manifest, self.config.get("index_workers", 1))
+        for filename, error in index.errors:
+            logger.error(f"加载歌词文件 {filename} 失败: {error}")
+
+        return index, reparsed, snapshot_stale or index.manifest != old_manifest
 
     def _preprocess_lyrics(self, lyrics: str) -> str:
         """预处理歌词，去除标点符号、emoji、QQ 表情等，统一大小写等"""
-        # 去除 QQ 表情格式 [表情:数字] 或类似格式
-        processed = re.sub(r'\[表情:\d+\]', '', lyrics)
-        processed = re.sub(r'\[[^\]]*\]', '', processed)  # 去除其他方括号格式
-          # 去除 emoji 表情（更精确的 Unicode 范围）
-        emoji_pattern = re.compile(
-            "["
-            "\U0001F600-\U0001F64F"  # emoticons
-            "\U0001F300-\U0001F5FF"  # symbols & pictographs
-            "\U0001F680-\U0001F6FF"  # transport & map symbols
-            "\U0001F1E0-\U0001F1FF"  # flags (iOS)
-            "\U00002700-\U000027BF"  # dingbats
-            "\U0001F900-\U0001F9FF"  # supplemental symbols
-            "\U0001FA70-\U0001FAFF"  # symbols and pictographs extended-a
-            "\U00002600-\U000026FF"  # miscellaneous symbols
-            "\U0001F780-\U0001F7FF"  # geometric shapes extended
-            "]+", flags=re.UNICODE)
-        processed = emoji_pattern.sub('', processed)
-
-        # 去除标点符号，保留字母、数字、中文字符、日文假名和空格
-        # a-zA-Z0-9: 英文字母和数字
-        # \u4e00-\u9fff: 中文字符
-        # \u3040-\u30ff: 日文平假名和片假名
-        # \uff66-\uff9f: 日文半角片假名
-        # \s: 空格字符
-        processed = re.sub(r'[^a-zA-Z0-9\u4e00-\u9fff\u3040-\u30ff\uff66-\uff9f\s]', '', processed)
-
-        # 去除多余空格
-        processed = re.sub(r'\s+', ' ', processed).strip()
-        # 转为小写
-        processed = processed.lower()
-        return processed
+        return normalize_lyrics(lyrics)
 
-    async def _find_next_lyrics(self, lyrics: str) -> Optional[Tuple[str, str]]:
-        """查找歌词的下一句，返回 (下一句, 歌曲名)"""
+    async def _match_lyrics(self, processed_lyrics: str, match_threshold: float) -> Optional[str]:
+        """查找与预处理后的歌词匹配的歌词索引键，没有匹配时返回 None"""
         # 直接查找精确匹配
-        processed_lyrics = self._preprocess_lyrics(lyrics) if self.config["preprocess_lyrics"] else lyrics
         if processed_lyrics in self.lyrics_index:
-            # 如果有多个匹配，随机选择一个
-            return random.choice(self.lyrics_index[processed_lyrics])
+            return processed_lyrics
 
-        # 如果没有精确匹配，尝试模糊匹配
-        match_threshold = self.config.get("match_threshold", 0.8)
-        best_match = None
-        best_similarity = 0.0
+        # 预筛排除不可能达到阈值的消息，省去模糊匹配
+        if self.match_gate is not None and not self.match_gate.may_match(processed_lyrics, match_threshold):
+            return None
 
-        for indexed_lyrics in self.lyrics_index.keys():
-            # 计算相似度
-            similarity = SequenceMatcher(None, processed_lyrics, indexed_lyrics).ratio()
-            if similarity > best_similarity and similarity >= match_threshold:
-                best_similarity = similarity
-                best_match = indexed_lyrics
+        # 如果没有精确匹配，尝试模糊匹配（只比较倒排索引筛选出的候选）
+        if self.match_pool:
+            match = await self.match_pool.best_match(processed_lyrics, match_threshold, self.fuzzy_matcher.stats)
+        else:
+            match = self.fuzzy_matcher.best_match(processed_lyrics, match_threshold)
 
         # 如果找到了足够相似的匹配
-        if best_match:
+        if match:
+            best_match, best_similarity = match
             logger.info(f"模糊匹配: '{processed_lyrics}' -> '{best_match}' (相似度: {best_similarity:.2f})")
-            return random.choice(self.lyrics_index[best_match])
+            return best_match
 
         # 没有找到匹配
         return None
 
+    async def _find_next_lyrics(self, lyrics: str) -> Optional[Tuple[str, str]]:
+        """查找歌词的下一句，返回 (下一句, 歌曲名)"""
+        preprocess = self.config["preprocess_lyrics"]
+        match_threshold = self.config.get("match_threshold", 0.8)
+        # 索引重建或匹配相关配置变化时，缓存自动失效
+        generation = (self.index_version, preprocess, match_threshold)
+
+        # 以预处理后的消息为键，只有标点、全半角等不同的消息共用同一条缓存
+        processed_lyrics = self._preprocess_lyrics(lyrics) if preprocess else lyrics
+        match_key = self.lookup_cache.get(processed_lyrics, generation)
+        if match_key is MISSING:
+            match_key = await self._match_lyrics(processed_lyrics, match_threshold)
+            self.lookup_cache.put(processed_lyrics, match_key, generation)
+
+        # 匹配期间索引可能已被重建，需确认匹配结果仍在当前索引中
+        if match_key is None or match_key not in self.lyrics_index:
+            return None
+        # 如果有多个匹配，随机选择一个
+        return self.index.choose_next(match_key)
+
     @filter.event_message_type(filter.EventMessageType.ALL)
     async def on_message(self, event: AstrMessageEvent):
         """处理所有消息，检查是否是歌词"""
@@ -287,6 +405,10 @@ class SingAlongPlugin(Star):
         if not message:
             return
 
+        # 首次加载歌词完成前不处理消息
+        if not self.index_ready:
+            return
+
         # 检查消息链中是否只包含文本消息，过滤掉图片、戳一戳等非文本消息
         message_chain = event.get_messages()
         if not message_chain:
@@ -332,10 +454,13 @@ class SingAlongPlugin(Star):
      * /lyrics search 晴天
      * /lyrics search 晴天 周杰伦
      * /lyrics search 晴天 周杰伦 QQ音乐
-3. /lyrics list - 列出所有已添加的歌曲
+3. /lyrics list [关键词] [页码] - 分页列出已添加的歌曲，可按歌名筛选
+   - /lyrics list count [关键词] - 只显示歌曲数量
 4. /lyrics view 歌曲名 - 查看指定歌曲的完整歌词内容
 5. /lyrics delete 歌曲名 - 从歌词库中删除指定歌曲
 6. /lyrics reload - 重新加载所有歌词文件
+7. /lyrics stats - 查看歌词匹配的统计信息
+8. /lyrics providers [reset] - 查看歌词平台的排序与熔断状态，reset 关闭所有熔断（管理员）
 
 💡 提示: 
 - 如需批量下载某个歌手的所有歌曲，可运行 tools/fetch_lyrics.py
@@ -348,11 +473,43 @@ class SingAlongPlugin(Star):
         # 根据配置决定是否迁移默认歌词到用户目录
         await self._migrate_lyrics_if_enabled()
             
-        # 重新加载歌词
-        await self._load_lyrics()
+        # 重新加载歌词，只重新解析有变化的文件
+        reparsed = await self._load_lyrics()
         yield (((
             (event.plain_result(
-                f"已重新加载歌词库，共 {len(self.lyrics_info)} 首歌曲，{len(self.lyrics_index)} 条歌词索引")))))
+                f"已重新加载歌词库，共 {len(self.lyrics_info)} 首歌曲，{len(self.lyrics_index)} 条歌词索引，"
+                f"重新解析了 {reparsed} 个歌词文件")))))
+
+    @lyrics_commands.command("stats")
+    async def stats_command(self, event: AstrMessageEvent):
+        """显示歌词匹配的统计信息"""
+        stage_names = {
+            "length_window": "长度窗口淘汰",
+            "bigram": "二元组计数淘汰",
+            "real_quick_ratio": "real_quick_ratio 淘汰",
+            "quick_ratio": "quick_ratio 淘汰",
+            "ratio": "完整相似度淘汰",
+            "accepted": "模糊匹配成功",
+        }
+        stats = self.fuzzy_matcher.stats
+        lines = [f"  {stage_names[stage]}: {stats[stage]}" for stage in self.fuzzy_matcher.STAGES]
+        fanouts = [self.index.fanout(key) for key in self.lyrics_index]
+        cache = self.lookup_cache
+        lookups = cache.hits + cache.misses
+        hit_rate = cache.hits / lookups if lookups else 0.0
+        gate = self.match_gate
+        checked, rejected = (gate.checked, gate.rejected) if gate else (0, 0)
+        reject_rate = rejected / checked if checked else 0.0
+        response_cache = self.provider_client.cache if self.provider_client else None
+        cache_hits, cache_misses = (response_cache.hits, response_cache.misses) if response_cache else (0, 0)
+        yield event.plain_result(
+            f"歌词库: {len(self.lyrics_info)} 首歌曲，{len(self.lyrics_index)} 条歌词索引，"
+            f"{sum(fanouts)} 个不同的后续条目（单句最多 {max(fanouts, default=0)} 个）\n"
+            f"查找缓存: {len(cache)}/{cache.max_size} 条，命中 {cache.hits} 次，未命中 {cache.misses} 次"
+            f"（命中率 {hit_rate:.1%}）\n"
+            f"模糊匹配预筛: 检查 {checked} 条消息，拒绝 {rejected} 条（{reject_rate:.1%}）\n"
+            f"歌词平台响应缓存: 命中 {cache_hits} 次，未命中 {cache_misses} 次\n"
+            f"模糊匹配候选统计（自上次加载歌词库以来）:\n" + "\n".join(lines))
 
     @lyrics_commands.command("search")
     async def search_command(self, event: AstrMessageEvent, song_name: str, artist_name: str = "",
@@ -387,27 +544,27 @@ class SingAlongPlugin(Star):
 
         if music_source:
             music_source = source_mapping.get(music_source.lower(), music_source)
+
+        # 提交到搜索队列；相同的搜索正在进行时共用其结果，队列已满时提示稍后再试
+        key = (song_name.strip().lower(), (artist_name or "").lower(), music_source)
+        try:
+            job, coalesced = self.search_queue.submit(
+                key, lambda: self._run_search(song_name, artist_name, music_source))
+        except asyncio.QueueFull:
+            logger.info(f"搜索队列已满，拒绝搜索请求: {song_name}")
+            yield event.plain_result("当前搜索歌词的请求较多，请稍后再试。")
+            return
+
+        if coalesced:
+            yield event.plain_result(f"《{song_name}》的歌词正在搜索中，完成后会一并回复，请稍候...")
+        elif music_source:
             yield event.plain_result(f"正在从{music_source}搜索《{song_name}》的歌词，请稍候...")
         else:
             yield event.plain_result(f"正在搜索《{song_name}》的歌词，请稍候...")
         try:
-            # 导入搜索模块
-            import sys
-            import os
-            tool_path = os.path.join(os.path.dirname(__file__), "tools")
-            if tool_path not in sys.path:
-                sys.path.append(tool_path)
-
-            from search_lyrics import search_and_save_lyrics
-
-            # 执行搜索，传入用户歌词目录
-            logger.info(f"开始搜索歌词, 歌名:{song_name}, 歌手:{artist_name}, 音乐源:{music_source}")
-            success, file_path, preview = search_and_save_lyrics(song_name, artist_name, music_source, self.lyrics_dir)
-            logger.info(f"搜索结果: 成功={success}, 文件路径={file_path}")
+            # 多个请求共用同一个任务，某个请求被取消时不影响任务本身
+            success, file_path, preview = await asyncio.shield(job)
             if success:
-                # 重新加载歌词库以包含新添加的歌词
-                await self._load_lyrics()
-
                 # 提取文件名作为歌曲名
                 song_name = os.path.basename(file_path).replace(".txt", "")
 
@@ -426,15 +583,122 @@ class SingAlongPlugin(Star):
             logger.error(f"错误详情: {error_trace}")
             yield event.plain_result(f"搜索歌词失败: {str(e)}\n请检查日志获取详细信息。")
 
+    async def _run_search(self, song_name: str, artist_name: Optional[str],
+                          music_source: Optional[str]) -> Tuple[bool, Optional[str], Optional[str]]:
+        """搜索队列中执行的任务：搜索并保存歌词，成功时把新歌词加入索引"""
+        # 导入搜索模块
+        if TOOLS_DIR not in sys.path:
+            sys.path.append(TOOLS_DIR)
+
+        from search_lyrics import search_and_save_lyrics_async
+
+        # 执行搜索，传入用户歌词目录；按 provider_search_mode 同时或对冲搜索各平台，不阻塞事件循环
+        logger.info(f"开始搜索歌词, 歌名:{song_name}, 歌手:{artist_name}, 音乐源:{music_source}")
+        success, file_path, preview = await search_and_save_lyrics_async(
+            song_name, artist_name, music_source, self.lyrics_dir, self.provider_client, self.provider_stats,
+            self.config.get("provider_search_mode", "race"), self.config.get("provider_hedge_percentile", 0.9))
+        logger.info(f"搜索结果: 成功={success}, 文件路径={file_path}")
+        await self._save_provider_stats()
+        if success:
+            # 将新添加的歌词加入索引
+            await self._load_lyrics([os.path.basename(file_path)])
+        return success, file_path, preview
+
+    async def _save_provider_stats(self):
+        """在线程中保存歌词平台统计，失败时只记录日志"""
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self.provider_stats.save,
+                                                             self.provider_stats_path)
+        except OSError as e:
+            logger.warning(f"保存歌词平台统计失败: {str(e)}")
+
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @lyrics_commands.command("providers")
+    async def providers_command(self, event: AstrMessageEvent, action: str = ""):
+        """查看歌词平台的排序、统计与熔断状态（管理员）；/lyrics providers reset 关闭所有熔断"""
+        if TOOLS_DIR not in sys.path:
+            sys.path.append(TOOLS_DIR)
+        from provider_stats import OPEN
+        from search_lyrics import PLATFORM_NAMES, PLATFORMS
+
+        stats = self.provider_stats
+        if action.strip().lower() == "reset":
+            stats.reset_breakers()
+            await self._save_provider_stats()
+            yield event.plain_result("已关闭所有歌词平台的熔断")
+            return
+
+        state_names = {"closed": "正常", "open": "熔断中", "half_open": "等待试探"}
+        lines = []
+        for rank, platform in enumerate(stats.rank(PLATFORMS), 1):
+            summary = stats.summary(platform)
+            state = stats.state(platform)
+            line = (f"{rank}. {PLATFORM_NAMES[platform]} [{state_names[state]}] "
+                    f"{summary['count']} 次，p50 {summary['p50'] * 1000:.0f} ms，p95 {summary['p95'] * 1000:.0f} ms，"
+                    f"命中率 {summary['hit_rate']:.0%}，错误率 {summary['error_rate']:.0%}")
+            if state == OPEN:
+                line += f"，{stats.cooldown_remaining(platform):.0f} 秒后恢复试探"
+            lines.append(line)
+        yield event.plain_result("歌词平台排序（按最近的搜索统计）:\n" + "\n".join(lines))
+
+    def _get_sorted_titles(self) -> List[str]:
+        """返回排序后的歌名列表，只在索引版本变化后重新排序"""
+        version, titles = self._sorted_titles
+        if version != self.index_version:
+            titles = sorted(self.lyrics_info)
+            self._sorted_titles = (self.index_version, titles)
+        return titles
+
     @lyrics_commands.command("list")
-    async def list_command(self, event: AstrMessageEvent):
-        """列出所有已添加的歌曲"""
+    async def list_command(self, event: AstrMessageEvent, keyword: str = "", page: str = ""):
+        """分页列出已添加的歌曲，可按歌名筛选：/lyrics list [关键词] [页码]；/lyrics list count [关键词] 只显示歌曲数量"""
+        if not self.index_ready:
+            yield event.plain_result("歌词库正在加载，请稍后再试")
+            return
+
         if not self.lyrics_info:
             yield event.plain_result("歌词库为空，请先添加歌词")
             return
 
-        song_list = "\n".join([f"{i + 1}. {song}" for i, song in enumerate(self.lyrics_info.keys())])
-        yield (event.plain_result(f"已添加的歌曲列表（共{len(self.lyrics_info)}首）：\n{song_list}"))
+        count_only = keyword.strip().lower() == "count"
+        if count_only:
+            keyword, page = page, ""
+        elif not page.strip() and keyword.strip().isdigit():
+            # 只有一个参数时，纯数字视为页码：/lyrics list 页码；数字关键词需带上页码，如 /lyrics list 1989 1
+            keyword, page = "", keyword
+        keyword = keyword.strip()
+
+        if keyword:
+            titles = sorted(self.index.titles.find_containing(keyword))
+        else:
+            titles = self._get_sorted_titles()
+
+        if count_only:
+            if keyword:
+                yield event.plain_result(f"歌名包含 '{keyword}' 的歌曲共 {len(titles)} 首（歌词库共 {len(self.lyrics_info)} 首）")
+            else:
+                yield event.plain_result(f"歌词库共 {len(titles)} 首歌曲，{len(self.lyrics_index)} 条歌词索引")
+            return
+
+        if not titles:
+            yield event.plain_result(f"未找到包含 '{keyword}' 的歌曲")
+            return
+
+        page_size = max(1, self.config.get("list_page_size", 30))
+        page_count = (len(titles) + page_size - 1) // page_size
+        page_number = int(page) if page.strip().isdigit() else 1
+        page_number = min(max(page_number, 1), page_count)
+        start = (page_number - 1) * page_size
+        song_list = "\n".join(f"{start + i + 1}. {song}"
+                               for i, song in enumerate(titles[start:start + page_size]))
+
+        title = f"歌名包含 '{keyword}' 的歌曲" if keyword else "已添加的歌曲列表"
+        footer = ""
+        if page_number < page_count:
+            command = f"/lyrics list {keyword} {page_number + 1}" if keyword else f"/lyrics list {page_number + 1}"
+            footer = f"\n发送 {command} 查看下一页"
+        yield event.plain_result(
+            f"{title}（共{len(titles)}首，第 {page_number}/{page_count} 页）：\n{song_list}{footer}")
 
     @lyrics_commands.command("view")
     async def view_command(self, event: AstrMessageEvent, song_name: str = ""):
@@ -443,6 +707,10 @@ class SingAlongPlugin(Star):
             yield event.plain_result("请提供歌曲名称，格式：/lyrics view 歌曲名")
             return
 
+        if not self.index_ready:
+            yield event.plain_result("歌词库正在加载，请稍后再试")
+            return
+
         match_status, target_song = self._find_song_by_name(song_name)
         if match_status == 0:
             # 完全匹配
@@ -457,13 +725,22 @@ class SingAlongPlugin(Star):
             return
 
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                lyrics_content = f.read().strip()
+            # 在线程中读取，最多读取显示所需的字符数，避免大文件阻塞事件循环
+            loop = asyncio.get_running_loop()
+            stat = await loop.run_in_executor(None, os.stat, file_path)
+            file_stat = (stat.st_size, stat.st_mtime_ns)
+            cached = self.view_cache.get(target_song, self.index_version)
+            if cached is not MISSING and cached[0] == file_stat:
+                lyrics_content, truncated = cached[1]
+            else:
+                lyrics_content, truncated = await loop.run_in_executor(
+                    None, read_lyrics_preview, file_path, VIEW_MAX_CHARS)
+                self.view_cache.put(target_song, (file_stat, (lyrics_content, truncated)), self.index_version)
 
             if lyrics_content:
                 # 限制显示长度，避免消息过长
-                if len(lyrics_content) > 2000:
-                    lyrics_preview = lyrics_content[:2000] + "\n...\n（歌词内容过长，已截断显示）"
+                if truncated:
+                    lyrics_preview = lyrics_content + "\n...\n（歌词内容过长，已截断显示）"
                 else:
                     lyrics_preview = lyrics_content
 
@@ -481,6 +758,10 @@ class SingAlongPlugin(Star):
             yield event.plain_result("请提供歌曲名称，格式：/lyrics delete 歌曲名")
             return
 
+        if not self.index_ready:
+            yield event.plain_result("歌词库正在加载，请稍后再试")
+            return
+
         match_status, target_song = self._find_song_by_name(song_name)
         if match_status == 0:
             # 完全匹配
@@ -496,8 +777,8 @@ class SingAlongPlugin(Star):
 
         try:
             os.remove(file_path)
-            # 重新加载歌词库以更新索引
-            await self._load_lyrics()
+            # 从索引中移除该歌曲
+            await self._load_lyrics([os.path.basename(file_path)])
             yield event.plain_result(f"已删除歌曲《{song_name}》的歌词")
         except Exception as e:
             logger.error(f"删除歌词文件失败: {str(e)}")
@@ -505,4 +786,19 @@ class SingAlongPlugin(Star):
 
     async def terminate(self):
         """插件终止时的清理工作"""
+        if self.watcher:
+            await self.watcher.stop()
+        if self.match_pool:
+            self.match_pool.shutdown()
+        if self.search_queue:
+            await self.search_queue.stop()
+        if self.provider_client:
+            await self.provider_client.close()
+        if self.provider_stats:
+            await self._save_provider_stats()
+        # 保存尚未写入的索引快照
+        if self._snapshot_task is not None:
+            self._snapshot_task.cancel()
+            self._snapshot_task = None
+        await self._save_snapshot()
         logger.info("SingAlong 插件已终止")
@@ -0,0 +1,69 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Tuple
+
+
+class SearchQueue:
+    """歌词搜索任务队列：有限的等待队列和固定数量的工作协程，相同的任务只执行一次
+
+    submit 按键合并任务：同一键的任务尚未完成时，后来的请求直接共用它的结果（single-flight）。
+    等待队列已满时 submit 抛出 asyncio.QueueFull，由调用方回复繁忙提示，避免任务无限堆积。
+    """
+
+    def __init__(self, worker_count: int, max_pending: int):
+        self.worker_count = max(1, worker_count)
+        self._queue: asyncio.Queue = asyncio.Queue(max(1, max_pending))
+        self._inflight: Dict[Hashable, asyncio.Future] = {}  # 键 -> 排队中或执行中的任务结果
+        self._workers: List[asyncio.Task] = []
+        self.coalesced = 0  # 共用已有任务结果的请求数
+        self.rejected = 0  # 因队列已满被拒绝的请求数
+
+    def start(self):
+        """在当前事件循环中启动工作协程"""
+        for _ in range(self.worker_count - len(self._workers)):
+            self._workers.append(asyncio.create_task(self._work()))
+
+    @property
+    def pending(self) -> int:
+        """排队中的任务数"""
+        return self._queue.qsize()
+
+    def submit(self, key: Hashable, job: Callable[[], Awaitable[Any]]) -> Tuple[asyncio.Future, bool]:
+        """提交任务，返回 (任务结果, 是否与已有任务合并)；队列已满时抛出 asyncio.QueueFull"""
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return future, True
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((key, job, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise
+        self._inflight[key] = future
+        return future, False
+
+    async def _work(self):
+        while True:
+            key, job, future = await self._queue.get()
+            try:
+                if not future.done():
+                    future.set_result(await job())
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self._inflight.pop(key, None)
+                self._queue.task_done()
+
+    async def stop(self):
+        """停止工作协程，取消尚未完成的任务"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+        for future in self._inflight.values():
+            future.cancel()
+        self._inflight.clear()
@@ -0,0 +1,82 @@
+from typing import Dict, List, Optional, Set
+
+
+def _bigrams(text: str) -> Set[str]:
+    """返回文本中的所有字符二元组"""
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+class TitleIndex:
+    """歌名索引：按小写歌名精确查找，以及按字符二元组倒排索引查找包含某段文字的歌名
+
+    结果顺序与歌曲的加入顺序一致（即歌曲信息字典的插入顺序），与逐个比较 .lower() 的结果相同。
+    """
+
+    def __init__(self):
+        self._order: Dict[str, int] = {}  # 歌名 -> 加入序号
+        self._next_order = 0
+        self._exact: Dict[str, List[str]] = {}  # 小写歌名 -> [歌名, ...]，按加入顺序
+        self._postings: Dict[str, Set[str]] = {}  # 小写歌名中的二元组 -> {歌名, ...}
+        self._chars: Dict[str, Set[str]] = {}  # 小写歌名中的字符 -> {歌名, ...}，用于单字查询
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def add(self, title: str):
+        """加入歌名；已存在时先移除，再排到最后"""
+        self.remove(title)
+        self._order[title] = self._next_order
+        self._next_order += 1
+        lowered = title.lower()
+        self._exact.setdefault(lowered, []).append(title)
+        for gram in _bigrams(lowered):
+            self._postings.setdefault(gram, set()).add(title)
+        for char in set(lowered):
+            self._chars.setdefault(char, set()).add(title)
+
+    def remove(self, title: str):
+        """移除歌名，不存在时忽略"""
+        if self._order.pop(title, None) is None:
+            return
+        lowered = title.lower()
+        titles = self._exact[lowered]
+        titles.remove(title)
+        if not titles:
+            del self._exact[lowered]
+        for index, keys in ((self._postings, _bigrams(lowered)), (self._chars, set(lowered))):
+            for key in keys:
+                index[key].discard(title)
+                if not index[key]:
+                    del index[key]
+
+    def copy(self) -> "TitleIndex":
+        """复制一份可独立修改的歌名索引"""
+        index = TitleIndex()
+        index._order = dict(self._order)
+        index._next_order = self._next_order
+        index._exact = {lowered: list(titles) for lowered, titles in self._exact.items()}
+        index._postings = {gram: set(titles) for gram, titles in self._postings.items()}
+        index._chars = {char: set(titles) for char, titles in self._chars.items()}
+        return index
+
+    def find_exact(self, name: str) -> Optional[str]:
+        """返回第一个与 name 忽略大小写相同的歌名"""
+        titles = self._exact.get(name.lower())
+        return titles[0] if titles else None
+
+    def find_containing(self, name: str) -> List[str]:
+        """返回所有忽略大小写后包含 name 的歌名，按加入顺序排列"""
+        lowered = name.lower()
+        if not lowered:
+            return list(self._order)
+        if len(lowered) == 1:
+            candidates = self._chars.get(lowered, set())
+        else:
+            # 从最稀有的二元组出发，逐个确认
+            postings = [self._postings.get(gram) for gram in _bigrams(lowered)]
+            if not all(postings):
+                return []
+            candidates = min(postings, key=len)
+        matches = [title for title in candidates if lowered in title.lower()]
+        matches.sort(key=self._order.__getitem__)
+        return matches
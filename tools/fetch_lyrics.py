@@ -1,10 +1,12 @@
+import hashlib
 import json
 import os
-import random
 import re
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-import requests
+from provider_client import HostRateLimiter, SyncProviderClient
+from response_cache import ResponseCache
 
 
 def contains_chinese(text):
@@ -27,6 +29,22 @@ HEADERS = {
     'Referer': 'https://www.google.com/',  # 默认 Referer
 }
 
+# 所有请求共用的 HTTP 客户端，复用连接并设置超时与重试；响应缓存在 data/provider_cache，
+# 设置环境变量 SINGALONG_PROVIDER_OFFLINE=1 时只从缓存读取
+CLIENT = SyncProviderClient(cache=ResponseCache.from_env())
+
+# 爬取清单：记录每首歌的下载状态，中断后重新运行时跳过已完成的歌曲
+MANIFEST_PATH = os.path.join(os.path.dirname(LYRICS_DIR), "fetch_manifest.json")
+MANIFEST_VERSION = 1
+PROVIDERS = {"1": "netease", "2": "qq", "3": "kugou"}
+# 视为已完成的状态；其余状态（未找到、失败）在下次运行时重试
+DONE_STATUSES = ("saved", "unchanged")
+
+# 默认的每个主机每秒请求数、突发请求数和同时下载的歌曲数
+DEFAULT_RATE = 2.0
+DEFAULT_BURST = 4
+DEFAULT_CONCURRENCY = 4
+
 
 def get_artist_songs(artist_name="周杰伦"):
     """从网易云音乐获取歌手的所有歌曲列表"""
@@ -41,7 +59,7 @@ def get_artist_songs(artist_name="周杰伦"):
             'limit': 1
         }
 
-        response = requests.get(search_url, headers=HEADERS, params=params)
+        response = CLIENT.get(search_url, headers=HEADERS, params=params)
         data = response.json()
 
         # 获取歌手 ID
@@ -50,7 +68,7 @@ def get_artist_songs(artist_name="周杰伦"):
 
             # 获取歌手的所有歌曲
             songs_url = f"https://music.163.com/api/v1/artist/{artist_id}"
-            response = requests.get(songs_url, headers=HEADERS)
+            response = CLIENT.get(songs_url, headers=HEADERS)
             data = response.json()
 
             songs = []
@@ -85,7 +103,7 @@ def get_song_lyrics(song_id):
     }
 
     try:
-        response = requests.get(lyrics_url, headers=HEADERS, params=params)
+        response = CLIENT.get(lyrics_url, headers=HEADERS, params=params)
         data = response.json()
 
         if 'lrc' in data and 'lyric' in data['lrc']:
@@ -134,7 +152,7 @@ def get_qq_music_songs(artist_name="周杰伦"):
     qq_headers['Referer'] = 'https://y.qq.com/'
 
     try:
-        response = requests.get(search_url, headers=qq_headers, params=params)
+        response = CLIENT.get(search_url, headers=qq_headers, params=params)
         data = response.json()
 
         # 解析搜索结果
@@ -179,7 +197,7 @@ def get_qq_music_songs(artist_name="周杰伦"):
                     "data": json.dumps(songs_data)
                 }
 
-                response = requests.get(songs_url, headers=qq_headers, params=params)
+                response = CLIENT.get(songs_url, headers=qq_headers, params=params)
                 data = response.json()
 
                 songs = []
@@ -228,7 +246,7 @@ def get_qq_music_lyrics(song_mid):
     qq_headers['Referer'] = 'https://y.qq.com/'
 
     try:
-        response = requests.get(lyrics_url, headers=qq_headers, params=params)
+        response = CLIENT.get(lyrics_url, headers=qq_headers, params=params)
         data = response.json()
 
         if 'lyric' in data and data.get('retcode', -1) == 0:
@@ -269,7 +287,7 @@ def get_kugou_songs(artist_name="周杰伦"):
     headers['Referer'] = 'https://www.kugou.com/'
 
     try:
-        response = requests.get(search_url, headers=headers, params=params)
+        response = CLIENT.get(search_url, headers=headers, params=params)
         data = response.json()
 
         songs = []
@@ -294,10 +312,9 @@ def get_kugou_songs(artist_name="周杰伦"):
         if len(songs) < 100:
             for page in range(2, 4):  # 搜索更多页
                 params['page'] = page
-                time.sleep(random.uniform(0.5, 1.0))  # 避免请求过快
 
                 try:
-                    response = requests.get(search_url, headers=headers, params=params)
+                    response = CLIENT.get(search_url, headers=headers, params=params)
                     data = response.json()
 
                     if data.get('status') == 1 and 'data' in data and 'info' in data['data']:
@@ -341,7 +358,7 @@ def get_kugou_lyrics(song_hash):
             'hash': song_hash
         }
 
-        response = requests.get(lyrics_url, headers=headers, params=lyrics_params)
+        response = CLIENT.get(lyrics_url, headers=headers, params=lyrics_params)
         data = response.json()
 
         if 'candidates' in data and len(data['candidates']) > 0:
@@ -362,7 +379,7 @@ def get_kugou_lyrics(song_hash):
                     'charset': 'utf8'
                 }
 
-                download_response = requests.get(download_url, headers=headers, params=download_params)
+                download_response = CLIENT.get(download_url, headers=headers, params=download_params)
                 download_data = download_response.json()
 
                 if download_data.get('status') == 200 and 'content' in download_data:
@@ -431,6 +448,120 @@ def _filter_lyrics_for_storage(lyrics):
     return '\n'.join(final_lines)
 
 
+def load_manifest(path=MANIFEST_PATH):
+    """读取爬取清单，返回 {"平台:歌曲 ID": 记录}；文件不存在或版本不符时返回空清单"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get("version") == MANIFEST_VERSION:
+            return data["songs"]
+    except (OSError, ValueError, KeyError, AttributeError):
+        pass
+    return {}
+
+
+def save_manifest(songs, path=MANIFEST_PATH):
+    """保存爬取清单，先写临时文件再替换，避免中断时留下损坏的清单"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"version": MANIFEST_VERSION, "songs": songs}, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def manifest_key(source, song):
+    return f"{PROVIDERS[source]}:{song['id']}"
+
+
+def is_done(record):
+    """清单记录是否表示该歌曲已下载完成，且歌词文件仍然存在"""
+    return (record is not None and record.get("status") in DONE_STATUSES and
+            os.path.exists(os.path.join(LYRICS_DIR, record.get("file", ""))))
+
+
+def download_song(song, source):
+    """获取一首歌的歌词并保存到歌词目录，返回 (状态, 文件名, 内容哈希)
+
+    状态为 saved（已写入）、unchanged（内容与已有文件相同，未重写）、not_found 或 failed。
+    """
+    song_name = song['name']
+    song_id = song['id']
+
+    # 处理歌名中的非法字符，防止保存文件出错
+    safe_song_name = re.sub(r'[\\/:*?"<>|]', '_', song_name)
+    file_name = f"{safe_song_name}.txt"
+
+    # 根据不同来源获取歌词
+    lyrics = None
+    if source == "1":
+        lyrics = get_song_lyrics(song_id)
+    elif source == "2":
+        lyrics = get_qq_music_lyrics(song.get('mid', ''))
+    elif source == "3":
+        lyrics = get_kugou_lyrics(song_id)
+
+    if not lyrics:
+        print(f"× 未找到歌曲《{song_name}》的歌词")
+        return "not_found", file_name, None
+
+    # 过滤歌词，去除作词作曲等信息
+    filtered_lyrics = _filter_lyrics_for_storage(lyrics)
+    data = filtered_lyrics.encode('utf-8')
+    content_hash = hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    # 内容与已有文件相同时不重写，避免触发插件重新建立索引
+    file_path = os.path.join(LYRICS_DIR, file_name)
+    try:
+        with open(file_path, 'rb') as f:
+            if f.read() == data:
+                print(f"= 歌词未变化: {file_path}")
+                return "unchanged", file_name, content_hash
+    except OSError:
+        pass
+
+    # 保存歌词到文件
+    try:
+        with open(file_path, 'wb') as f:
+            f.write(data)
+        print(f"✓ 歌词已保存到: {file_path}")
+        return "saved", file_name, content_hash
+    except Exception as e:
+        print(f"× 保存歌词失败: {str(e)}")
+        return "failed", file_name, None
+
+
+def _record_result(manifest, source, song, future):
+    """把一首歌的下载结果记入爬取清单，返回是否成功"""
+    try:
+        status, file_name, content_hash = future.result()
+    except Exception as e:
+        print(f"× 下载歌曲《{song['name']}》出错: {str(e)}")
+        status, file_name, content_hash = "failed", None, None
+    key = manifest_key(source, song)
+    previous = manifest.get(key, {})
+    manifest[key] = {
+        "provider": PROVIDERS[source],
+        "id": song['id'],
+        "name": song['name'],
+        "file": file_name,
+        "status": status,
+        "hash": content_hash,
+        "attempts": previous.get("attempts", 0) + 1,
+    }
+    return status in DONE_STATUSES
+
+
+def _input_number(prompt, default, cast):
+    """读取一个正数，输入为空或无效时使用默认值"""
+    value = input(f"{prompt} (默认: {default}): ").strip()
+    try:
+        number = cast(value)
+        if number > 0:
+            return number
+    except ValueError:
+        pass
+    return default
+
+
 def main():
     """主函数，爬取指定歌手的所有歌词"""
     # 让用户输入歌手名称
@@ -439,6 +570,11 @@ def main():
     # 选择歌词源
     source = input("请选择歌词数据来源 (1: 网易云音乐, 2: QQ 音乐, 3: 酷狗音乐): ").strip()
 
+    # 按主机限速，防止被封 IP：每秒最多 rate 个请求，短时间内最多连续发出 burst 个
+    rate = _input_number("请输入每个平台每秒最多请求数", DEFAULT_RATE, float)
+    burst = _input_number("请输入允许的突发请求数", DEFAULT_BURST, int)
+    CLIENT.rate_limiter = HostRateLimiter(rate, burst)
+
     if source == "1":
         print(f"使用网易云音乐爬取{artist_name}的歌词...")
         songs = get_artist_songs(artist_name)
@@ -449,7 +585,8 @@ def main():
         print(f"使用酷狗音乐爬取{artist_name}的歌词...")
         songs = get_kugou_songs(artist_name)
     else:
-        print(f"无效的选择，默认使用网易云音乐")
+        print("无效的选择，默认使用网易云音乐")
+        source = "1"
         songs = get_artist_songs(artist_name)
 
     if not songs:
@@ -465,61 +602,49 @@ def main():
             songs = songs[:limit]
             print(f"将爬取前 {limit} 首歌曲")
 
-    # 添加随机延时，防止被封 IP
-    delay_min = 1
-    delay_max = 3
-    delay_str = input(f"请输入请求间隔时间范围（秒），格式为'最小值-最大值'(默认: {delay_min}-{delay_max}): ").strip()
-    if delay_str and '-' in delay_str:
-        try:
-            min_val, max_val = map(float, delay_str.split('-'))
-            if 0 <= min_val < max_val:
-                delay_min = min_val
-                delay_max = max_val
-        except:
-            pass
-    print(f"请求间隔时间设置为: {delay_min}-{delay_max}秒")
+    # 跳过清单中已完成的歌曲，只下载新歌曲和之前失败的歌曲
+    manifest = load_manifest()
+    pending = [song for song in songs if not is_done(manifest.get(manifest_key(source, song)))]
+    if len(pending) < len(songs):
+        print(f"爬取清单中已完成 {len(songs) - len(pending)} 首，本次跳过")
+    if not pending:
+        print("所有歌曲均已下载完成")
+        return
+
+    concurrency = _input_number("请输入同时下载的歌曲数", DEFAULT_CONCURRENCY, int)
+    print(f"限速: 每个平台每秒 {rate} 个请求，突发 {burst} 个；同时下载 {concurrency} 首")
 
     success_count = 0
-    for i, song in enumerate(songs):
-        song_name = song['name']
-        song_id = song['id']
-
-        # 处理歌名中的非法字符，防止保存文件出错
-        safe_song_name = re.sub(r'[\\/:*?"<>|]', '_', song_name)
-
-        # 避免频繁请求被封 IP
-        time.sleep(random.uniform(delay_min, delay_max))
-
-        # 根据不同来源获取歌词
-        lyrics = None
-        if source == "1":
-            lyrics = get_song_lyrics(song_id)
-        elif source == "2":
-            lyrics = get_qq_music_lyrics(song.get('mid', ''))
-        elif source == "3":
-            lyrics = get_kugou_lyrics(song_id)
-
-        if lyrics:
-            # 过滤歌词，去除作词作曲等信息
-            filtered_lyrics = _filter_lyrics_for_storage(lyrics)
-
-            # 保存歌词到文件
-            file_path = os.path.join(LYRICS_DIR, f"{safe_song_name}.txt")
-            try:
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(filtered_lyrics)
-                print(f"✓ 歌词已保存到: {file_path}")
+    recorded = set()  # 已记入清单的任务
+    start_time = time.monotonic()
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    futures = {executor.submit(download_song, song, source): song for song in pending}
+    try:
+        for finished, future in enumerate(as_completed(futures), 1):
+            if _record_result(manifest, source, futures[future], future):
                 success_count += 1
-            except Exception as e:
-                print(f"× 保存歌词失败: {str(e)}")
-        else:
-            print(f"× 未找到歌曲《{song_name}》的歌词")
-
-        # 显示进度
-        progress = (i + 1) / len(songs) * 100
-        print(f"当前进度: {progress:.1f}%")
-
-    print(f"\n爬取完成！共成功获取 {success_count}/{len(songs)} 首歌曲的歌词")
+            recorded.add(future)
+            # 每完成一首就更新清单，中断后可从这里继续
+            save_manifest(manifest)
+            # 显示进度
+            progress = finished / len(pending) * 100
+            print(f"当前进度: {progress:.1f}%")
+    except BaseException:
+        # 中断或出错时取消排队中的下载（正在进行的下载会在后台结束），
+        # 把已经完成但尚未记录的歌曲写入清单，重新运行时从这里继续
+        executor.shutdown(wait=False, cancel_futures=True)
+        for future, song in futures.items():
+            if future not in recorded and future.done() and not future.cancelled():
+                _record_result(manifest, source, song, future)
+        save_manifest(manifest)
+        raise
+    executor.shutdown()
+    elapsed = time.monotonic() - start_time
+
+    print(f"\n爬取完成！本次成功获取 {success_count}/{len(pending)} 首歌曲的歌词")
+    print(f"用时 {elapsed:.1f} 秒，平均每分钟 {len(pending) / elapsed * 60:.1f} 首"
+          f"（成功 {success_count / elapsed * 60:.1f} 首）")
+    print(f"爬取清单已保存到: {MANIFEST_PATH}，重新运行时只会重试未完成的歌曲")
     print(f"歌词文件已保存在: {LYRICS_DIR}")
 
 
@@ -534,4 +659,5 @@ if __name__ == "__main__":
 
         traceback.print_exc()
     finally:
+        CLIENT.close()
         input("\n按 Enter 键退出...")
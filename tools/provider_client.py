@@ -0,0 +1,210 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# 建立连接和读取响应的超时时间（秒）
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 10
+# 失败后的最多重试次数，以及退避时间的基数（第 n 次重试前等待 BACKOFF_FACTOR * 2 ** (n - 1) 秒）
+MAX_RETRIES = 2
+BACKOFF_FACTOR = 0.5
+# 遇到这些状态码时重试
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# 每个主机保持的连接数，以及同步客户端缓存的主机连接池数
+POOL_SIZE_PER_HOST = 8
+POOL_HOSTS = 16
+# 设置该环境变量后，请求改发到该地址（如 benchmarks/stand_in_providers.py 启动的本地替身平台）
+BASE_URL_ENV = "SINGALONG_PROVIDER_BASE_URL"
+
+
+def rewrite_url(url, base_url):
+    """把平台 URL 改写到 base_url 下：https://music.163.com/api/x -> {base_url}/music.163.com/api/x"""
+    if not base_url:
+        return url
+    parts = urlsplit(url)
+    rewritten = f"{base_url.rstrip('/')}/{parts.hostname}{parts.path}"
+    return f"{rewritten}?{parts.query}" if parts.query else rewritten
+
+
+class TokenBucket:
+    """令牌桶：以 rate 个/秒的速度补充令牌，最多积攒 burst 个，每次请求消耗一个"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """预约一个令牌，返回需要等待的秒数（令牌不足时记为欠账，后续请求顺延）"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self):
+        """阻塞直到获得一个令牌"""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        """异步等待直到获得一个令牌"""
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class HostRateLimiter:
+    """按主机限速，每个主机各自使用一个令牌桶"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, url):
+        host = urlsplit(url).hostname or ""
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self.rate, self.burst)
+            return self._buckets[host]
+
+    def acquire(self, url):
+        self.bucket(url).acquire()
+
+    async def acquire_async(self, url):
+        await self.bucket(url).acquire_async()
+
+
+class CachedResponse:
+    """从响应缓存读出的响应，提供 SyncProviderClient 调用方用到的 requests.Response 属性"""
+
+    status_code = 200
+
+    def __init__(self, text):
+        self.text = text
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class SyncProviderClient:
+    """歌词平台的同步 HTTP 客户端，供命令行脚本使用
+
+    基于 requests.Session 按主机复用 keep-alive 连接，统一设置超时，并在连接失败或遇到
+    可重试的状态码时退避重试。传入 ResponseCache 时先查缓存，并缓存状态码为 200 的响应
+    （ResponseCache 只保存内容为成功结果的响应）。
+    """
+
+    def __init__(self, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT,
+                 max_retries=MAX_RETRIES, backoff_factor=BACKOFF_FACTOR, pool_size=POOL_SIZE_PER_HOST,
+                 rate_limiter=None, cache=None, base_url=None):
+        self.timeout = (connect_timeout, read_timeout)
+        self.rate_limiter = rate_limiter  # HostRateLimiter，为 None 时不限速
+        self.cache = cache  # ResponseCache，为 None 时不缓存
+        self.base_url = base_url or os.environ.get(BASE_URL_ENV)  # 为 None 时直接请求平台
+        self.session = requests.Session()
+        retry = Retry(total=max_retries, backoff_factor=backoff_factor, status_forcelist=RETRY_STATUSES,
+                      allowed_methods=frozenset(["GET"]), raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, url, headers=None, params=None):
+        """发送 GET 请求，返回 requests.Response（命中缓存时返回 CachedResponse）"""
+        if self.cache is not None:
+            text = self.cache.get(url, params)
+            if text is not None:
+                return CachedResponse(text)
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(url)
+        response = self.session.get(rewrite_url(url, self.base_url), headers=headers, params=params,
+                                    timeout=self.timeout)
+        if self.cache is not None and response.status_code == 200:
+            self.cache.put(url, params, response.text)
+        return response
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class AsyncProviderClient:
+    """歌词平台的异步 HTTP 客户端，超时与重试策略与 SyncProviderClient 相同
+
+    基于 aiohttp.ClientSession 按主机复用 keep-alive 连接。会话在第一次请求时于当前事件循环中
+    创建；插件在 initialize 中创建客户端、在 terminate 中关闭。缓存的读写在线程池中进行，
+    不阻塞事件循环。
+    """
+
+    def __init__(self, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT,
+                 max_retries=MAX_RETRIES, backoff_factor=BACKOFF_FACTOR, pool_size=POOL_SIZE_PER_HOST,
+                 rate_limiter=None, cache=None, base_url=None):
+        self.timeout = aiohttp.ClientTimeout(connect=connect_timeout, sock_read=read_timeout)
+        self.rate_limiter = rate_limiter  # HostRateLimiter，为 None 时不限速
+        self.cache = cache  # ResponseCache，为 None 时不缓存
+        self.base_url = base_url or os.environ.get(BASE_URL_ENV)  # 为 None 时直接请求平台
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.pool_size = pool_size
+        self._session = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit_per_host=self.pool_size)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    async def get_text(self, url, headers=None, params=None):
+        """发送 GET 请求并返回响应文本；连接失败、超时或遇到可重试的状态码时退避后重试"""
+        loop = asyncio.get_running_loop()
+        if self.cache is not None:
+            text = await loop.run_in_executor(None, self.cache.get, url, params)
+            if text is not None:
+                return text
+        request_url = rewrite_url(url, self.base_url)
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire_async(url)
+            try:
+                async with self._get_session().get(request_url, headers=headers, params=params) as response:
+                    if response.status not in RETRY_STATUSES or attempt >= self.max_retries:
+                        text = await response.text()
+                        if self.cache is not None and response.status == 200:
+                            await loop.run_in_executor(None, self.cache.put, url, params, text)
+                        return text
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if attempt >= self.max_retries:
+                    raise
+            attempt += 1
+            await asyncio.sleep(self.backoff_factor * 2 ** (attempt - 1))
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
@@ -0,0 +1,171 @@
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+
+# 每个平台保留的最近搜索记录数
+WINDOW_SIZE = 100
+# 记录数少于该值的平台不按统计排序，排在最前面（相互之间保持默认优先级）
+MIN_SAMPLES = 5
+# 连续失败达到该次数时熔断，冷却时间（秒）内跳过该平台
+FAILURE_THRESHOLD = 3
+COOLDOWN_SECONDS = 120.0
+STATS_VERSION = 1
+
+# 搜索结果：找到歌词、未找到、出错（连接失败、超时、响应无法解析等）、因其他平台先返回而被取消
+HIT, MISS, ERROR, CANCELLED = "hit", "miss", "error", "cancelled"
+
+# 熔断器状态：正常、熔断中、冷却结束后放行一次试探请求
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+class ProviderStats:
+    """歌词平台的滚动统计与熔断器
+
+    每个平台保留最近 WINDOW_SIZE 次搜索的耗时和结果，按「预计取得歌词的耗时」（耗时中位数除以
+    找到歌词的比例）从小到大排序；记录不足 MIN_SAMPLES 次的平台排在前面，以便尽快积累统计，
+    熔断中的平台排在最后。被取消的搜索只计入耗时（作为下限），不计入命中率和错误率。
+
+    连续出错 failure_threshold 次后熔断，cooldown 秒内 allow 返回 False；冷却结束后放行一次试探，
+    成功则恢复，仍然出错则再次熔断。
+    """
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, cooldown=COOLDOWN_SECONDS, window_size=WINDOW_SIZE):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.window_size = window_size
+        self._samples = {}  # 平台 -> deque[(耗时, 结果)]
+        self._failures = {}  # 平台 -> 连续出错次数
+        self._open_until = {}  # 平台 -> 熔断结束的时间戳（time.time()）
+        self._probing = set()  # 正在试探的平台
+        self._lock = threading.Lock()
+
+    def _window(self, provider):
+        if provider not in self._samples:
+            self._samples[provider] = deque(maxlen=self.window_size)
+        return self._samples[provider]
+
+    def record(self, provider, latency, outcome):
+        """记录一次搜索的耗时（秒）和结果"""
+        with self._lock:
+            self._window(provider).append((latency, outcome))
+            if outcome == CANCELLED:
+                self._probing.discard(provider)
+                return
+            if outcome == ERROR:
+                self._failures[provider] = self._failures.get(provider, 0) + 1
+                if provider in self._probing or self._failures[provider] >= self.failure_threshold:
+                    self._open_until[provider] = time.time() + self.cooldown
+            else:
+                self._failures[provider] = 0
+                self._open_until.pop(provider, None)
+            self._probing.discard(provider)
+
+    def state(self, provider):
+        """返回熔断器状态"""
+        with self._lock:
+            return self._state(provider)
+
+    def _state(self, provider):
+        open_until = self._open_until.get(provider)
+        if open_until is None:
+            return CLOSED
+        return OPEN if time.time() < open_until else HALF_OPEN
+
+    def cooldown_remaining(self, provider):
+        """返回熔断剩余的秒数，未熔断时为 0"""
+        with self._lock:
+            return max(0.0, self._open_until.get(provider, 0.0) - time.time())
+
+    def allow(self, provider):
+        """是否可以向该平台发送请求；冷却结束后只放行一次试探请求"""
+        with self._lock:
+            state = self._state(provider)
+            if state == HALF_OPEN and provider not in self._probing:
+                self._probing.add(provider)
+                return True
+            return state == CLOSED
+
+    def summary(self, provider):
+        """返回平台的统计：记录数、耗时 p50/p95（秒）、命中率、错误率"""
+        with self._lock:
+            samples = list(self._samples.get(provider, ()))
+        latencies = [latency for latency, _ in samples]
+        outcomes = [outcome for _, outcome in samples if outcome != CANCELLED]
+        finished = len(outcomes) or 1
+        return {
+            "count": len(samples),
+            "p50": _percentile(latencies, 0.5),
+            "p95": _percentile(latencies, 0.95),
+            "hit_rate": outcomes.count(HIT) / finished,
+            "error_rate": outcomes.count(ERROR) / finished,
+        }
+
+    def latency_percentile(self, provider, fraction):
+        """返回已结束（未被取消）的搜索耗时的分位数，记录不足 MIN_SAMPLES 次时返回 None"""
+        with self._lock:
+            latencies = [latency for latency, outcome in self._samples.get(provider, ()) if outcome != CANCELLED]
+        if len(latencies) < MIN_SAMPLES:
+            return None
+        return _percentile(latencies, fraction)
+
+    def _score(self, provider):
+        summary = self.summary(provider)
+        tripped = self.state(provider) != CLOSED
+        if summary["count"] < MIN_SAMPLES:
+            return tripped, -1.0
+        return tripped, summary["p50"] / max(summary["hit_rate"], 0.05)
+
+    def rank(self, providers):
+        """按统计排序平台（相同得分时保持传入的顺序）"""
+        return sorted(providers, key=self._score)
+
+    def reset_breakers(self):
+        """关闭所有平台的熔断器"""
+        with self._lock:
+            self._failures.clear()
+            self._open_until.clear()
+            self._probing.clear()
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "version": STATS_VERSION,
+                "samples": {provider: list(samples) for provider, samples in self._samples.items()},
+                "failures": dict(self._failures),
+                "open_until": dict(self._open_until),
+            }
+
+    def save(self, path):
+        """保存到 JSON 文件（先写临时文件再替换）"""
+        data = self.to_dict()
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        """从 JSON 文件读取，文件不存在、损坏或版本不符时返回空统计"""
+        stats = cls(**kwargs)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != STATS_VERSION:
+                return stats
+            for provider, samples in data["samples"].items():
+                stats._window(provider).extend((float(latency), outcome) for latency, outcome in samples)
+            stats._failures = {provider: int(count) for provider, count in data["failures"].items()}
+            stats._open_until = {provider: float(until) for provider, until in data["open_until"].items()}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return cls(**kwargs)
+        return stats
@@ -0,0 +1,222 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+from provider_client import BASE_URL_ENV
+
+# 缓存目录默认放在插件 data 目录下
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "provider_cache")
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# 设置该环境变量为 1 时，命令行工具只从缓存读取响应（离线回放）
+OFFLINE_ENV = "SINGALONG_PROVIDER_OFFLINE"
+
+# 接口类型 -> 缓存有效期（秒）：搜索结果会随曲库更新而变化，歌词内容基本不变
+DEFAULT_TTLS = {
+    "search": 6 * 3600,
+    "artist": 24 * 3600,
+    "lyrics": 30 * 24 * 3600,
+    "other": 3600,
+}
+
+
+def _qq_musicu_ok(data):
+    """QQ 音乐 musicu 接口：顶层和每个子请求的 code 都为 0，且子请求带有 data"""
+    replies = [value for value in data.values() if isinstance(value, dict)]
+    return (data.get("code", 0) == 0 and bool(replies) and
+            all(reply.get("code", 0) == 0 and "data" in reply for reply in replies))
+
+
+# 平台在 HTTP 200 的响应中也会报告失败（如网易云音乐限流时的 {"code": -460}、QQ 音乐 retcode
+# 不为 0、酷狗音乐 status 异常），只缓存带有预期字段的成功响应
+# (主机, 路径前缀, 接口类型, 响应 JSON 是否可以缓存)
+ENDPOINT_KINDS = (
+    ("music.163.com", "/api/search/get", "search",
+     lambda data: data.get("code") == 200 and isinstance(data.get("result"), dict)),
+    ("music.163.com", "/api/v1/artist/", "artist",
+     lambda data: data.get("code") == 200 and isinstance(data.get("hotSongs"), list)),
+    ("music.163.com", "/api/song/lyric", "lyrics",
+     lambda data: data.get("code") == 200 and bool((data.get("lrc") or {}).get("lyric"))),
+    ("u.y.qq.com", "/cgi-bin/musicu.fcg", "search", _qq_musicu_ok),
+    ("c.y.qq.com", "/lyric/", "lyrics",
+     lambda data: data.get("retcode") == 0 and bool(data.get("lyric"))),
+    ("mobilecdn.kugou.com", "/api/v3/search/", "search",
+     lambda data: data.get("status") == 1 and isinstance((data.get("data") or {}).get("info"), list)),
+    ("krcs.kugou.com", "/search", "lyrics",
+     lambda data: data.get("status") == 200 and bool(data.get("candidates"))),
+    ("lyrics.kugou.com", "/download", "lyrics",
+     lambda data: data.get("status") == 200 and bool(data.get("content"))),
+)
+
+
+class OfflineCacheMiss(Exception):
+    """离线回放模式下请求的响应不在缓存中"""
+
+
+def endpoint_kind(url):
+    """返回 URL 对应的接口类型"""
+    parts = urlsplit(url)
+    for host, path_prefix, kind, _ in ENDPOINT_KINDS:
+        if parts.hostname == host and parts.path.startswith(path_prefix):
+            return kind
+    return "other"
+
+
+def is_usable(url, text):
+    """响应是否为可以缓存的成功响应：必须是 JSON 对象，已知接口还须带有该接口的成功标志和预期字段"""
+    try:
+        data = json.loads(text)
+    except (TypeError, ValueError):
+        return False
+    if not isinstance(data, dict):
+        return False
+    parts = urlsplit(url)
+    for host, path_prefix, _, check in ENDPOINT_KINDS:
+        if parts.hostname == host and parts.path.startswith(path_prefix):
+            try:
+                return bool(check(data))
+            except (AttributeError, TypeError):
+                return False
+    return True
+
+
+def _normalize_value(value):
+    """规范化参数值：统一转为字符串；JSON 字符串（如 QQ 音乐的 data 参数）按键排序后重新序列化"""
+    value = str(value)
+    if value[:1] in "{[":
+        try:
+            return json.dumps(json.loads(value), sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        except ValueError:
+            pass
+    return value
+
+
+def cache_key(url, params=None):
+    """由平台主机、接口路径和规范化后的参数计算缓存键"""
+    parts = urlsplit(url)
+    normalized = sorted((str(k), _normalize_value(v)) for k, v in (params or {}).items())
+    if parts.query:
+        normalized.append(("", parts.query))
+    raw = json.dumps([parts.hostname, parts.path, normalized], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """歌词平台响应的磁盘缓存
+
+    以规范化后的请求计算内容地址，每个响应存为一个文件；读取时按接口类型判断是否过期，
+    总大小超过上限时删除最早写入的条目。只缓存 is_usable 认可的响应，平台在 HTTP 200 中报告的
+    失败不会在有效期内被反复回放。离线模式下忽略有效期，缓存未命中时抛出
+    OfflineCacheMiss，不发出任何网络请求。
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, ttls=None, offline=False):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._sizes = None  # 文件路径 -> (写入时间, 大小)，首次写入时扫描缓存目录得到
+        self._total_bytes = 0
+
+    @classmethod
+    def from_env(cls, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        """创建缓存，离线模式由环境变量 SINGALONG_PROVIDER_OFFLINE 决定
+
+        设置了 SINGALONG_PROVIDER_BASE_URL 时，替身平台的响应缓存在按地址区分的子目录中，
+        不会混入真实平台的缓存。
+        """
+        base_url = os.environ.get(BASE_URL_ENV)
+        if base_url:
+            digest = hashlib.sha256(base_url.encode("utf-8")).hexdigest()[:12]
+            cache_dir = os.path.join(cache_dir, f"stand_in_{digest}")
+        return cls(cache_dir, max_bytes, offline=os.environ.get(OFFLINE_ENV) == "1")
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".json")
+
+    def get(self, url, params=None):
+        """返回缓存的响应文本；未命中或已过期时返回 None（离线模式下抛出 OfflineCacheMiss）"""
+        path = self._path(cache_key(url, params))
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            fresh = self.offline or time.time() - entry["stored_at"] <= self.ttls[endpoint_kind(url)]
+            # 旧版本可能缓存过失败响应，读取时同样检查
+            if fresh and is_usable(url, entry["text"]):
+                self.hits += 1
+                return entry["text"]
+        except (OSError, ValueError, KeyError):
+            pass
+        self.misses += 1
+        if self.offline:
+            raise OfflineCacheMiss(f"离线模式下缓存未命中: {url} {params}")
+        return None
+
+    def put(self, url, params, text):
+        """写入响应文本（不是可用的成功响应时忽略），总大小超过上限时淘汰最早写入的条目"""
+        if self.offline or self.max_bytes <= 0 or not is_usable(url, text):
+            return
+        path = self._path(cache_key(url, params))
+        data = json.dumps({"url": url, "params": params, "stored_at": time.time(), "text": text},
+                          ensure_ascii=False).encode("utf-8")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 先写临时文件再替换，并发读取时不会读到写了一半的文件
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            sizes = self._scan()
+            old = sizes.get(path)
+            if old is not None:
+                self._total_bytes -= old[1]
+            sizes[path] = (time.time(), len(data))
+            self._total_bytes += len(data)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _scan(self):
+        if self._sizes is None:
+            self._sizes = {}
+            if os.path.isdir(self.cache_dir):
+                # 只统计按缓存键前两位划分的子目录，替身平台的缓存子目录不计入
+                for prefix in os.listdir(self.cache_dir):
+                    prefix_dir = os.path.join(self.cache_dir, prefix)
+                    if len(prefix) != 2 or not os.path.isdir(prefix_dir):
+                        continue
+                    for name in os.listdir(prefix_dir):
+                        if name.endswith(".json"):
+                            path = os.path.join(prefix_dir, name)
+                            stat = os.stat(path)
+                            self._sizes[path] = (stat.st_mtime, stat.st_size)
+            self._total_bytes = sum(size for _, size in self._sizes.values())
+        return self._sizes
+
+    def _evict(self):
+        """按写入时间从早到晚删除条目，直到总大小降到上限的 90% 以下"""
+        target = self.max_bytes * 0.9
+        for path, (_, size) in sorted(self._sizes.items(), key=lambda item: item[1][0]):
+            if self._total_bytes <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            del self._sizes[path]
+            self._total_bytes -= size
+
+    def clear(self):
+        """删除所有缓存条目"""
+        with self._lock:
+            for path in list(self._scan()):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._sizes = {}
+            self._total_bytes = 0
@@ -1,8 +1,13 @@
+import asyncio
+import base64
 import json
 import os
 import re
+import time
 
-import requests
+from provider_client import AsyncProviderClient
+from provider_stats import CANCELLED, ERROR, HIT, MISS
+from response_cache import OfflineCacheMiss, ResponseCache
 
 
 def contains_chinese(text):
@@ -18,61 +23,226 @@ LYRICS_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "lyrics")
 os.makedirs(LYRICS_DIR, exist_ok=True)
 
 
-def search_song_lyrics(song_name, music_source=None, artist_name=None):
-    """使用多个平台搜索单首歌曲的歌词"""
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+    'Referer': 'https://www.google.com/',
+}
+
+# 平台的优先级顺序：同时返回歌词时优先采用排在前面的平台
+PLATFORMS = ('netease', 'qq', 'kugou')
+
+# 未指定音乐源时的搜索方式：race 同时搜索所有平台；hedge 先搜索排在最前的平台，超过对冲等待时间
+# 仍未返回时再加入下一个平台；sequential 逐个平台搜索
+SEARCH_MODES = ('race', 'hedge', 'sequential')
+# 对冲等待时间取平台耗时的该分位数；统计不足时使用 DEFAULT_HEDGE_DELAY 秒
+DEFAULT_HEDGE_PERCENTILE = 0.9
+DEFAULT_HEDGE_DELAY = 1.0
+PLATFORM_NAMES = {
+    'netease': '网易云音乐',
+    'qq': 'QQ 音乐',
+    'kugou': '酷狗音乐',
+}
+
+def _select_platforms(music_source=None):
+    """根据指定的音乐源返回要搜索的平台，按优先级排列"""
+    if not music_source:
+        # 不指定平台，搜索所有平台
+        return list(PLATFORMS)
+    # 只搜索指定的平台
+    if music_source.lower() in ['netease', '网易云', '网易']:
+        return ['netease']
+    if music_source.lower() in ['qq', 'qq音乐', 'qqmusic']:
+        return ['qq']
+    if music_source.lower() in ['kugou', '酷狗', '酷狗音乐']:
+        return ['kugou']
+    return []
+
+
+def _strip_lrc_tags(raw_lyrics):
+    """处理歌词格式，去除时间标签和元信息标签"""
+    processed_lyrics = []
+    for line in raw_lyrics.split('\n'):
+        line = re.sub(r'\[\d+:\d+\.\d+\]', '', line).strip()
+        if line and not line.startswith('['):
+            processed_lyrics.append(line)
+    return '\n'.join(processed_lyrics)
+
+
+async def _get_json(client, url, headers, params=None):
+    """发送 GET 请求并解析 JSON（部分平台的 Content-Type 不是 application/json，因此自行解析）"""
+    return json.loads(await client.get_text(url, headers, params))
+
+
+async def search_song_lyrics_async(song_name, music_source=None, artist_name=None, client=None, stats=None,
+                                   mode='race', hedge_percentile=DEFAULT_HEDGE_PERCENTILE):
+    """在多个平台搜索单首歌曲的歌词，采用最先返回的歌词
+
+    mode 为 race 时所有选中的平台并发搜索，一旦有平台返回歌词就取消其余平台的请求；多个平台在
+    同一时刻返回歌词时，按平台的优先级选择。mode 为 hedge 或 sequential 时见 _hedge_platforms。
+    未传入 client 时临时创建一个使用默认响应缓存的 AsyncProviderClient。
+
+    传入 ProviderStats 时记录每个平台的耗时和结果，按统计排出优先级，并在开始搜索某个平台时
+    跳过熔断中的平台。
+    """
     print(f"正在搜索歌曲《{song_name}》的歌词...")
     if artist_name:
         print(f"指定歌手: {artist_name}")
     if music_source:
         print(f"指定音乐源: {music_source}")
 
-    # 设置请求头
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-        'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-        'Referer': 'https://www.google.com/',
+    platforms = _select_platforms(music_source)
+    if stats is not None:
+        platforms = stats.rank(platforms)
+    if not platforms:
+        print(f"未能从{music_source or '任何平台'}找到歌词")
+        return None
+
+    if client is None:
+        async with AsyncProviderClient(cache=ResponseCache.from_env()) as client:
+            return await _search_platforms(client, platforms, song_name, music_source, artist_name, stats,
+                                           mode, hedge_percentile)
+    return await _search_platforms(client, platforms, song_name, music_source, artist_name, stats,
+                                   mode, hedge_percentile)
+
+
+async def _search_platforms(client, platforms, song_name, music_source, artist_name, stats, mode,
+                            hedge_percentile):
+    if mode == 'race':
+        return await _race_platforms(client, platforms, song_name, music_source, artist_name, stats)
+
+    def hedge_delay(platform):
+        if mode == 'sequential':
+            return None
+        delay = stats.latency_percentile(platform, hedge_percentile) if stats is not None else None
+        return DEFAULT_HEDGE_DELAY if delay is None else delay
+
+    return await _hedge_platforms(client, platforms, song_name, music_source, artist_name, stats, hedge_delay)
+
+
+async def _timed_search(platform, client, song_name, artist_name, stats):
+    """调用平台的搜索函数，并把耗时和结果记入 stats"""
+    searchers = {
+        'netease': search_netease,
+        'qq': search_qq,
+        'kugou': search_kugou,
     }
+    start = time.monotonic()
+    outcome = ERROR
+    try:
+        lyrics = await searchers[platform](client, song_name, artist_name, DEFAULT_HEADERS)
+        outcome = HIT if lyrics else MISS
+        return lyrics
+    except asyncio.CancelledError:
+        outcome = CANCELLED
+        raise
+    except OfflineCacheMiss:
+        # 离线模式下缓存未命中不是平台的问题，不计入错误
+        outcome = MISS
+        raise
+    finally:
+        if stats is not None:
+            stats.record(platform, time.monotonic() - start, outcome)
+
+
+def _allowed(platform, stats):
+    """即将开始搜索平台时检查熔断器；半开状态下放行的是唯一一次试探，只能在真正发出请求前调用"""
+    if stats is None or stats.allow(platform):
+        return True
+    print(f"{PLATFORM_NAMES[platform]}连续出错，暂时跳过")
+    return False
 
-    # 根据指定的音乐源选择性搜索
-    platforms = []
-    if music_source:
-        # 只搜索指定的平台
-        if music_source.lower() in ['netease', '网易云', '网易']:
-            platforms.append('netease')
-        elif music_source.lower() in ['qq', 'qq音乐', 'qqmusic']:
-            platforms.append('qq')
-        elif music_source.lower() in ['kugou', '酷狗', '酷狗音乐']:
-            platforms.append('kugou')
-    else:
-        # 不指定平台，按默认顺序尝试所有平台
-        platforms = ['netease', 'qq', 'kugou']
 
-    # 按指定顺序尝试不同平台
+async def _race_platforms(client, platforms, song_name, music_source, artist_name, stats=None):
+    tasks = {}
     for platform in platforms:
-        try:
-            if platform == 'netease':
-                print("尝试从网易云音乐搜索...")
-                lyrics = search_netease(song_name, artist_name, headers)
-                if lyrics:
-                    print("网易云音乐: 成功获取歌词")
-                    return lyrics
-            elif platform == 'qq':
-                print("尝试从 QQ 音乐搜索...")
-                lyrics = search_qq(song_name, artist_name, headers)
+        if not _allowed(platform, stats):
+            continue
+        print(f"尝试从{PLATFORM_NAMES[platform]}搜索...")
+        task = asyncio.ensure_future(_timed_search(platform, client, song_name, artist_name, stats))
+        tasks[task] = platform
+
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            # 同一轮完成的任务中按平台优先级选择
+            for task in sorted(done, key=lambda t: platforms.index(tasks[t])):
+                platform = tasks[task]
+                try:
+                    lyrics = task.result()
+                except Exception as e:
+                    print(f"{PLATFORM_NAMES[platform]}搜索出错: {str(e)}")
+                    continue
                 if lyrics:
-                    print("QQ 音乐: 成功获取歌词")
+                    print(f"{PLATFORM_NAMES[platform]}: 成功获取歌词")
                     return lyrics
-            elif platform == 'kugou':
-                print("尝试从酷狗音乐搜索...")
-                lyrics = search_kugou(song_name, artist_name, headers)
+    finally:
+        # 已有平台返回歌词（或搜索被取消）时，取消其余平台的请求
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    if music_source:
+        print(f"未能从{music_source}找到歌词")
+    else:
+        print("未能从任何平台找到歌词")
+    return None
+
+
+async def _hedge_platforms(client, platforms, song_name, music_source, artist_name, stats, hedge_delay):
+    """按优先级逐个加入平台的搜索，采用最先返回的歌词
+
+    先搜索第一个平台；它在 hedge_delay(平台) 秒内没有结果时，同时开始搜索下一个平台（返回 None 时
+    一直等待），已开始的平台出错或未找到歌词时立即开始下一个。一旦有平台返回歌词就取消其余请求。
+    """
+    waiting = list(platforms)
+    tasks = {}
+    pending = set()
+
+    def launch():
+        """开始搜索 waiting 中下一个未熔断的平台并返回该平台，没有可搜索的平台时返回 None"""
+        while waiting:
+            platform = waiting.pop(0)
+            if not _allowed(platform, stats):
+                continue
+            print(f"尝试从{PLATFORM_NAMES[platform]}搜索...")
+            task = asyncio.ensure_future(_timed_search(platform, client, song_name, artist_name, stats))
+            tasks[task] = platform
+            pending.add(task)
+            return platform
+        return None
+
+    latest = launch()
+    try:
+        while pending:
+            timeout = hedge_delay(latest) if waiting else None
+            done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                print(f"{PLATFORM_NAMES[latest]} {timeout:.2f} 秒内未返回，同时搜索下一个平台")
+                latest = launch() or latest
+                continue
+            pending.difference_update(done)
+            for task in sorted(done, key=lambda t: platforms.index(tasks[t])):
+                platform = tasks[task]
+                try:
+                    lyrics = task.result()
+                except Exception as e:
+                    print(f"{PLATFORM_NAMES[platform]}搜索出错: {str(e)}")
+                    continue
                 if lyrics:
-                    print("酷狗音乐: 成功获取歌词")
+                    print(f"{PLATFORM_NAMES[platform]}: 成功获取歌词")
                     return lyrics
-        except Exception as e:
-            print(f"{platform}搜索出错: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            # 已结束的平台都没有歌词，立即开始下一个
+            if waiting:
+                latest = launch() or latest
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
 
     if music_source:
         print(f"未能从{music_source}找到歌词")
@@ -81,320 +251,255 @@ def search_song_lyrics(song_name, music_source=None, artist_name=None):
     return None
 
 
-def search_netease(song_name, artist_name=None, headers=None):
+def search_song_lyrics(song_name, music_source=None, artist_name=None):
+    """使用多个平台搜索单首歌曲的歌词（search_song_lyrics_async 的同步封装）"""
+    return asyncio.run(search_song_lyrics_async(song_name, music_source, artist_name))
+
+
+async def search_netease(client, song_name, artist_name=None, headers=None):
     """从网易云音乐搜索歌词"""
     if headers is None:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-            'Referer': 'https://www.google.com/',
-        }
+        headers = DEFAULT_HEADERS
 
-    try:
-        search_term = f"{song_name} {artist_name if artist_name else ''}"
-
-        # 搜索歌曲
-        search_url = f"https://music.163.com/api/search/get?s={search_term}&type=1&limit=10"
-        response = requests.get(search_url, headers=headers)
-        data = response.json()
-
-        if 'result' in data and 'songs' in data['result'] and len(data['result']['songs']) > 0:
-            # 找到匹配的歌曲
-            for song in data['result']['songs']:
-                song_id = song['id']
-                found_song_name = song['name']
-                found_artist_name = song['artists'][0]['name'] if song['artists'] else ''
-
-                # 如果指定了歌手，检查是否匹配
-                if artist_name and artist_name.lower() not in found_artist_name.lower():
-                    continue
+    search_term = f"{song_name} {artist_name if artist_name else ''}"
 
-                print(f"找到歌曲: {found_song_name} - {found_artist_name}")
+    # 搜索歌曲
+    search_url = "https://music.163.com/api/search/get"
+    data = await _get_json(client, search_url, headers, {'s': search_term, 'type': 1, 'limit': 10})
 
-                # 获取歌词
-                lyrics_url = f"https://music.163.com/api/song/lyric?id={song_id}&lv=1&kv=1&tv=-1"
-                response = requests.get(lyrics_url, headers=headers)
-                lyrics_data = response.json()
+    if 'result' in data and 'songs' in data['result'] and len(data['result']['songs']) > 0:
+        # 找到匹配的歌曲
+        for song in data['result']['songs']:
+            song_id = song['id']
+            found_song_name = song['name']
+            found_artist_name = song['artists'][0]['name'] if song['artists'] else ''
 
-                if 'lrc' in lyrics_data and 'lyric' in lyrics_data['lrc']:
-                    raw_lyrics = lyrics_data['lrc']['lyric']
+            # 如果指定了歌手，检查是否匹配
+            if artist_name and artist_name.lower() not in found_artist_name.lower():
+                continue
 
-                    # 处理歌词格式，去除时间标签
-                    processed_lyrics = []
-                    for line in raw_lyrics.split('\n'):
-                        line = re.sub(r'\[\d+:\d+\.\d+\]', '', line).strip()
-                        if line and not line.startswith('['):
-                            processed_lyrics.append(line)
+            print(f"找到歌曲: {found_song_name} - {found_artist_name}")
 
-                    lyrics = '\n'.join(processed_lyrics)
+            # 获取歌词
+            lyrics_url = "https://music.163.com/api/song/lyric"
+            lyrics_data = await _get_json(client, lyrics_url, headers,
+                                          {'id': song_id, 'lv': 1, 'kv': 1, 'tv': -1})
 
-                    return lyrics
+            if 'lrc' in lyrics_data and 'lyric' in lyrics_data['lrc']:
+                return _strip_lrc_tags(lyrics_data['lrc']['lyric'])
 
-        print("网易云音乐: 未找到歌词")
-        return None
-    except Exception as e:
-        print(f"网易云音乐搜索出错: {str(e)}")
-        return None
+    print("网易云音乐: 未找到歌词")
+    return None
 
 
-def search_kugou(song_name, artist_name=None, headers=None):
+async def search_kugou(client, song_name, artist_name=None, headers=None):
     """从酷狗音乐搜索歌词"""
     if headers is None:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-            'Referer': 'https://www.kugou.com/',
-        }
-
-    try:
-        search_term = f"{song_name} {artist_name if artist_name else ''}"
-
-        # 酷狗音乐搜索API
-        search_url = "http://mobilecdn.kugou.com/api/v3/search/song"
-        params = {
-            'format': 'json',
-            'keyword': search_term,
-            'page': 1,
-            'pagesize': 20,
-            'showtype': 1
-        }
+        headers = dict(DEFAULT_HEADERS, Referer='https://www.kugou.com/')
+
+    search_term = f"{song_name} {artist_name if artist_name else ''}"
+
+    # 酷狗音乐搜索API
+    search_url = "http://mobilecdn.kugou.com/api/v3/search/song"
+    params = {
+        'format': 'json',
+        'keyword': search_term,
+        'page': 1,
+        'pagesize': 20,
+        'showtype': 1
+    }
 
-        response = requests.get(search_url, headers=headers, params=params)
+    response_text = await client.get_text(search_url, headers, params)
 
-        if response.text and response.text.strip():
-            try:
-                data = response.json()
-
-                if data.get('status') == 1 and 'data' in data and 'info' in data['data']:
-                    songs = data['data']['info']
-
-                    # 找到匹配的歌曲
-                    for song in songs:
-                        found_song_name = song.get('songname', '')
-                        found_artist_name = song.get('singername', '')
-                        hash_value = song.get('hash', '')
-
-                        # 优化歌手匹配逻辑
-                        if artist_name:
-                            if not (artist_name.lower() in found_artist_name.lower() or
-                                    found_artist_name.lower() in artist_name.lower() or
-                                    any(word in found_artist_name.lower() for word in artist_name.lower().split())):
-                                continue
-
-                        # 优化歌曲名匹配
-                        if song_name.lower() not in found_song_name.lower():
+    if response_text and response_text.strip():
+        try:
+            data = json.loads(response_text)
+
+            if data.get('status') == 1 and 'data' in data and 'info' in data['data']:
+                songs = data['data']['info']
+
+                # 找到匹配的歌曲
+                for song in songs:
+                    found_song_name = song.get('songname', '')
+                    found_artist_name = song.get('singername', '')
+                    hash_value = song.get('hash', '')
+
+                    # 优化歌手匹配逻辑
+                    if artist_name:
+                        if not (artist_name.lower() in found_artist_name.lower() or
+                                found_artist_name.lower() in artist_name.lower() or
+                                any(word in found_artist_name.lower() for word in artist_name.lower().split())):
                             continue
 
-                        print(f"找到歌曲: {found_song_name} - {found_artist_name}")
-
-                        # 获取歌词
-                        lyrics_url = "http://krcs.kugou.com/search"
-                        lyrics_params = {
-                            'ver': 1,
-                            'man': 'yes',
-                            'client': 'mobi',
-                            'keyword': f"{found_song_name} {found_artist_name}",
-                            'duration': song.get('duration', ''),
-                            'hash': hash_value
-                        }
-
-                        lyrics_response = requests.get(lyrics_url, headers=headers, params=lyrics_params)
-
-                        if lyrics_response.text:
-                            try:
-                                lyrics_data = lyrics_response.json()
-
-                                if 'candidates' in lyrics_data and len(lyrics_data['candidates']) > 0:
-                                    # 获取第一个候选歌词
-                                    candidate = lyrics_data['candidates'][0]
-                                    lyrics_id = candidate.get('id')
-                                    access_key = candidate.get('accesskey')
-
-                                    if lyrics_id and access_key:
-                                        # 获取具体歌词内容
-                                        download_url = "http://lyrics.kugou.com/download"
-                                        download_params = {
-                                            'ver': 1,
-                                            'client': 'pc',
-                                            'id': lyrics_id,
-                                            'accesskey': access_key,
-                                            'fmt': 'lrc',
-                                            'charset': 'utf8'
-                                        }
-
-                                        download_response = requests.get(download_url, headers=headers,
-                                                                         params=download_params)
-
-                                        if download_response.text:
-                                            try:
-                                                download_data = download_response.json()
-
-                                                if download_data.get('status') == 200 and 'content' in download_data:
-                                                    import base64
-                                                    # 解码Base64编码的歌词
-                                                    encoded_lyrics = download_data['content']
-                                                    raw_lyrics = base64.b64decode(encoded_lyrics).decode('utf-8')
-
-                                                    # 处理歌词格式，去除时间标签
-                                                    processed_lyrics = []
-                                                    for line in raw_lyrics.split('\n'):
-                                                        line = re.sub(r'\[\d+:\d+\.\d+\]', '', line).strip()
-                                                        if line and not line.startswith('['):
-                                                            processed_lyrics.append(line)
-
-                                                    lyrics = '\n'.join(processed_lyrics)
-
-                                                    if lyrics.strip():
-                                                        return lyrics
-                                            except Exception as e:
-                                                print(f"酷狗音乐: 解析歌词内容失败: {str(e)}")
-                                                continue
-                            except Exception as e:
-                                print(f"酷狗音乐: 解析歌词搜索结果失败: {str(e)}")
-                                continue
-            except Exception as e:
-                print(f"酷狗音乐: 解析搜索结果 JSON 失败: {str(e)}")
+                    # 优化歌曲名匹配
+                    if song_name.lower() not in found_song_name.lower():
+                        continue
+
+                    print(f"找到歌曲: {found_song_name} - {found_artist_name}")
+
+                    # 获取歌词
+                    lyrics_url = "http://krcs.kugou.com/search"
+                    lyrics_params = {
+                        'ver': 1,
+                        'man': 'yes',
+                        'client': 'mobi',
+                        'keyword': f"{found_song_name} {found_artist_name}",
+                        'duration': song.get('duration', ''),
+                        'hash': hash_value
+                    }
+
+                    lyrics_text = await client.get_text(lyrics_url, headers, lyrics_params)
+
+                    if lyrics_text:
+                        try:
+                            lyrics_data = json.loads(lyrics_text)
+
+                            if 'candidates' in lyrics_data and len(lyrics_data['candidates']) > 0:
+                                # 获取第一个候选歌词
+                                candidate = lyrics_data['candidates'][0]
+                                lyrics_id = candidate.get('id')
+                                access_key = candidate.get('accesskey')
+
+                                if lyrics_id and access_key:
+                                    # 获取具体歌词内容
+                                    download_url = "http://lyrics.kugou.com/download"
+                                    download_params = {
+                                        'ver': 1,
+                                        'client': 'pc',
+                                        'id': lyrics_id,
+                                        'accesskey': access_key,
+                                        'fmt': 'lrc',
+                                        'charset': 'utf8'
+                                    }
+
+                                    download_text = await client.get_text(download_url, headers,
+                                                                    download_params)
+
+                                    if download_text:
+                                        try:
+                                            download_data = json.loads(download_text)
+
+                                            if download_data.get('status') == 200 and 'content' in download_data:
+                                                # 解码Base64编码的歌词
+                                                encoded_lyrics = download_data['content']
+                                                raw_lyrics = base64.b64decode(encoded_lyrics).decode('utf-8')
+                                                lyrics = _strip_lrc_tags(raw_lyrics)
+
+                                                if lyrics.strip():
+                                                    return lyrics
+                                        except Exception as e:
+                                            print(f"酷狗音乐: 解析歌词内容失败: {str(e)}")
+                                            continue
+                        except Exception as e:
+                            print(f"酷狗音乐: 解析歌词搜索结果失败: {str(e)}")
+                            continue
+        except Exception as e:
+            print(f"酷狗音乐: 解析搜索结果 JSON 失败: {str(e)}")
 
-        print("酷狗音乐: 未找到歌词")
-        return None
-    except Exception as e:
-        print(f"酷狗音乐搜索出错: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return None
+    print("酷狗音乐: 未找到歌词")
+    return None
 
 
-def search_qq(song_name, artist_name=None, headers=None):
+async def search_qq(client, song_name, artist_name=None, headers=None):
     """从 QQ 音乐搜索歌词"""
     if headers is None:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-            'Referer': 'https://www.google.com/',
-        }
-
-    try:
-        search_term = f"{song_name} {artist_name if artist_name else ''}"
-
-        qq_headers = headers.copy()
-        qq_headers['Referer'] = 'https://y.qq.com/'
-
-        # 搜索歌曲
-        search_url = "https://u.y.qq.com/cgi-bin/musicu.fcg"
-        search_data = {
-            "req_0": {
-                "method": "DoSearchForQQMusicDesktop",
-                "module": "music.search.SearchCgiService",
-                "param": {
-                    "query": search_term,
-                    "page_num": 1,
-                    "num_per_page": 20,
-                    "search_type": 0
-                }
+        headers = DEFAULT_HEADERS
+
+    search_term = f"{song_name} {artist_name if artist_name else ''}"
+
+    qq_headers = headers.copy()
+    qq_headers['Referer'] = 'https://y.qq.com/'
+
+    # 搜索歌曲
+    search_url = "https://u.y.qq.com/cgi-bin/musicu.fcg"
+    search_data = {
+        "req_0": {
+            "method": "DoSearchForQQMusicDesktop",
+            "module": "music.search.SearchCgiService",
+            "param": {
+                "query": search_term,
+                "page_num": 1,
+                "num_per_page": 20,
+                "search_type": 0
             }
         }
+    }
 
-        params = {
-            "data": json.dumps(search_data)
-        }
-
-        response = requests.get(search_url, headers=qq_headers, params=params)
-        data = response.json()
-
-        # 解析搜索结果
-        if ('req_0' in data and 'data' in data['req_0'] and 'body' in data['req_0']['data'] and
-                'song' in data['req_0']['data']['body'] and 'list' in data['req_0']['data']['body']['song']):
-            song_list = data['req_0']['data']['body']['song']['list']
-
-            for song in song_list:
-                found_song_name = song.get('title', '')
-                song_mid = song.get('mid', '')
-
-                # 优化歌手匹配逻辑
-                if artist_name:
-                    found_artist = False
-                    singer_names = []
-                    for singer in song.get('singer', []):
-                        singer_name = singer.get('name', '')
-                        singer_names.append(singer_name)
-                        if (artist_name.lower() in singer_name.lower() or
-                                singer_name.lower() in artist_name.lower()):
-                            found_artist = True
-                            break
-
-                    if not found_artist:
-                        full_singer_name = ' '.join(singer_names)
-                        if not (artist_name.lower() in full_singer_name.lower() or
-                                any(word in full_singer_name.lower() for word in artist_name.lower().split())):
-                            continue
-
-                # 优化歌曲名匹配
-                if song_name.lower() not in found_song_name.lower():
-                    continue
-
-                print(f"找到歌曲: {found_song_name} - {' '.join([s.get('name', '') for s in song.get('singer', [])])}")
-
-                # 获取歌词
-                lyrics_url = "https://c.y.qq.com/lyric/fcgi-bin/fcg_query_lyric_new.fcg"
-                params = {
-                    'songmid': song_mid,
-                    'g_tk': '5381',
-                    'loginUin': '0',
-                    'hostUin': '0',
-                    'format': 'json',
-                    'inCharset': 'utf8',
-                    'outCharset': 'utf-8',
-                    'notice': '0',
-                    'platform': 'yqq.json',
-                    'needNewCode': '0'
-                }
-
-                qq_headers['Referer'] = 'https://y.qq.com/'
-
-                response = requests.get(lyrics_url, headers=qq_headers, params=params)
+    params = {
+        "data": json.dumps(search_data)
+    }
 
-                try:
-                    lyrics_data = response.json()
-                    if 'lyric' in lyrics_data and lyrics_data.get('retcode', -1) == 0:
-                        # QQ 音乐返回的歌词是 Base64 编码的
-                        import base64
-                        raw_lyrics = base64.b64decode(lyrics_data['lyric']).decode('utf-8')
-
-                        # 处理歌词格式，去除时间标签
-                        processed_lyrics = []
-                        for line in raw_lyrics.split('\n'):
-                            line = re.sub(r'\[\d+:\d+\.\d+\]', '', line).strip()
-                            if line and not line.startswith('['):
-                                processed_lyrics.append(line)
-
-                        lyrics = '\n'.join(processed_lyrics)
-
-                        if lyrics.strip():
-                            return lyrics
-                except Exception as e:
-                    print(f"QQ 音乐: 解析歌词失败: {str(e)}")
-                    continue
+    data = await _get_json(client, search_url, qq_headers, params)
+
+    # 解析搜索结果
+    if ('req_0' in data and 'data' in data['req_0'] and 'body' in data['req_0']['data'] and
+            'song' in data['req_0']['data']['body'] and 'list' in data['req_0']['data']['body']['song']):
+        song_list = data['req_0']['data']['body']['song']['list']
+
+        for song in song_list:
+            found_song_name = song.get('title', '')
+            song_mid = song.get('mid', '')
+
+            # 优化歌手匹配逻辑
+            if artist_name:
+                found_artist = False
+                singer_names = []
+                for singer in song.get('singer', []):
+                    singer_name = singer.get('name', '')
+                    singer_names.append(singer_name)
+                    if (artist_name.lower() in singer_name.lower() or
+                            singer_name.lower() in artist_name.lower()):
+                        found_artist = True
+                        break
+
+                if not found_artist:
+                    full_singer_name = ' '.join(singer_names)
+                    if not (artist_name.lower() in full_singer_name.lower() or
+                            any(word in full_singer_name.lower() for word in artist_name.lower().split())):
+                        continue
+
+            # 优化歌曲名匹配
+            if song_name.lower() not in found_song_name.lower():
+                continue
+
+            print(f"找到歌曲: {found_song_name} - {' '.join([s.get('name', '') for s in song.get('singer', [])])}")
+
+            # 获取歌词
+            lyrics_url = "https://c.y.qq.com/lyric/fcgi-bin/fcg_query_lyric_new.fcg"
+            params = {
+                'songmid': song_mid,
+                'g_tk': '5381',
+                'loginUin': '0',
+                'hostUin': '0',
+                'format': 'json',
+                'inCharset': 'utf8',
+                'outCharset': 'utf-8',
+                'notice': '0',
+                'platform': 'yqq.json',
+                'needNewCode': '0'
+            }
 
-        print("QQ 音乐: 未找到歌词")
-        return None
-    except Exception as e:
-        print(f"QQ 音乐搜索出错: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return None
+            lyrics_text = await client.get_text(lyrics_url, qq_headers, params)
 
+            try:
+                lyrics_data = json.loads(lyrics_text)
+                if 'lyric' in lyrics_data and lyrics_data.get('retcode', -1) == 0:
+                    # QQ 音乐返回的歌词是 Base64 编码的
+                    raw_lyrics = base64.b64decode(lyrics_data['lyric']).decode('utf-8')
+                    lyrics = _strip_lrc_tags(raw_lyrics)
+
+                    if lyrics.strip():
+                        return lyrics
+            except Exception as e:
+                print(f"QQ 音乐: 解析歌词失败: {str(e)}")
+                continue
 
-def search_and_save_lyrics(song_name, artist_name=None, music_source=None, custom_lyrics_dir=None):
-    """搜索歌词并保存到歌词库，返回 (是否成功, 文件路径, 预览内容)"""
-    print(f"search_and_save_lyrics: 歌名='{song_name}', 歌手='{artist_name}', 音乐源='{music_source}'")
-    lyrics = search_song_lyrics(song_name, music_source, artist_name)
+    print("QQ 音乐: 未找到歌词")
+    return None
 
-    if not lyrics:
-        return False, None, None
 
+def _save_lyrics(lyrics, song_name, artist_name=None, custom_lyrics_dir=None):
+    """过滤并保存歌词，返回 (是否成功, 文件路径, 预览内容)"""
     # 过滤歌词，去除作词作曲等信息行，保持歌词文件纯粹
     filtered_lyrics = _filter_lyrics_for_storage(lyrics)
 
@@ -408,7 +513,7 @@ def search_and_save_lyrics(song_name, artist_name=None, music_source=None, custo
 
     # 确定保存目录 - 如果传入了自定义目录则使用，否则使用默认目录
     lyrics_dir = custom_lyrics_dir if custom_lyrics_dir else LYRICS_DIR
-    
+
     # 保存到歌词库
     file_path = os.path.join(lyrics_dir, f"{file_name}.txt")
 
@@ -428,6 +533,26 @@ def search_and_save_lyrics(song_name, artist_name=None, music_source=None, custo
         return False, None, filtered_lyrics
 
 
+async def search_and_save_lyrics_async(song_name, artist_name=None, music_source=None, custom_lyrics_dir=None,
+                                       client=None, stats=None, mode='race',
+                                       hedge_percentile=DEFAULT_HEDGE_PERCENTILE):
+    """搜索歌词并保存到歌词库，返回 (是否成功, 文件路径, 预览内容)"""
+    print(f"search_and_save_lyrics: 歌名='{song_name}', 歌手='{artist_name}', 音乐源='{music_source}'")
+    lyrics = await search_song_lyrics_async(song_name, music_source, artist_name, client, stats, mode,
+                                            hedge_percentile)
+
+    if not lyrics:
+        return False, None, None
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, _save_lyrics, lyrics, song_name, artist_name, custom_lyrics_dir)
+
+
+def search_and_save_lyrics(song_name, artist_name=None, music_source=None, custom_lyrics_dir=None):
+    """搜索歌词并保存到歌词库，返回 (是否成功, 文件路径, 预览内容)（同步封装，供命令行使用）"""
+    return asyncio.run(search_and_save_lyrics_async(song_name, artist_name, music_source, custom_lyrics_dir))
+
+
 def _filter_lyrics_for_storage(lyrics):
     """过滤歌词用于存储，去除作词作曲等信息行，保持歌词文件纯粹"""
     lines = lyrics.split('\n')